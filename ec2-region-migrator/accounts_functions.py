@@ -0,0 +1,189 @@
+import os
+import json
+from datetime import datetime, timedelta, timezone
+import boto3
+import get_data_functions as data
+import create_tf_files_functions as tf
+import audit_functions as audit
+
+ROLE_SESSION_NAME = "ec2-region-migrator"
+ROLE_SESSION_SECONDS = 3600
+# Credentials are renewed when they expire within this margin
+CREDENTIALS_REFRESH_MARGIN = timedelta(minutes=5)
+# Instance states create_image accepts, used when the Filters of an account do not select states
+MIGRATABLE_INSTANCE_STATES = ["running", "stopped"]
+
+# Settings shared by every account, kept so that a worker process can migrate several accounts in turn
+BASE_SETTINGS = {
+    "SourceRegion": data.AWS_DEFAULT_REGION,
+    "DestinationRegion": data.DESTINATION_REGION,
+    "MaxConcurrentCopies": data.MAX_CONCURRENT_COPIES,
+    "AuditDirectory": audit.AUDIT_DIRECTORY,
+    "TerraformDirectory": tf.TERRAFORM_DIRECTORY,
+    "BackendKey": os.getenv("KEY"),
+}
+
+
+class AssumedRoleCredentials:
+    """
+    Temporary credentials of an IAM role, assumed on first use and renewed before they expire.
+
+    Clients created without a region use the region given to the credentials, so every
+    call of an account goes to its source region rather than to AWS_DEFAULT_REGION.
+    """
+
+    def __init__(self, role_arn, region_name=None, session_name=ROLE_SESSION_NAME,
+                 duration_seconds=ROLE_SESSION_SECONDS):
+        self.role_arn = role_arn
+        self.region_name = region_name
+        self.session_name = session_name
+        self.duration_seconds = duration_seconds
+        self.session = None
+        self.expiration = None
+
+    def get_session(self):
+        """
+        Get a Boto3 session with valid credentials of the role.
+
+        :return: boto3.Session
+            The cached session, or a new one when the credentials are about to expire.
+        """
+        now = datetime.now(timezone.utc)
+        if self.session is None or self.expiration - now < CREDENTIALS_REFRESH_MARGIN:
+            response = boto3.client("sts").assume_role(
+                RoleArn=self.role_arn,
+                RoleSessionName=self.session_name,
+                DurationSeconds=self.duration_seconds
+            )
+            credentials = response["Credentials"]
+            self.session = boto3.Session(
+                aws_access_key_id=credentials["AccessKeyId"],
+                aws_secret_access_key=credentials["SecretAccessKey"],
+                aws_session_token=credentials["SessionToken"],
+                region_name=self.region_name
+            )
+            self.expiration = credentials["Expiration"]
+        return self.session
+
+    def ec2_client(self, region_name=None):
+        """
+        Create an EC2 client with the credentials of the role.
+
+        :param region_name: str
+            The region of the client, or None for the region of the credentials.
+
+        :return: An EC2 client.
+        """
+        if region_name is None:
+            return self.get_session().client("ec2")
+        return self.get_session().client("ec2", region_name=region_name)
+
+
+def load_accounts(file_location):
+    """
+    Read the list of accounts to migrate.
+
+    Each entry holds an AccountId, the RoleArn to assume in that account and an instance
+    selector: either InstanceIds or describe_instances Filters. MaxConcurrentCopies,
+    GroupByTag, SourceRegion and DestinationRegion optionally override the defaults for
+    the account.
+
+    :param file_location: str
+        The path to the JSON file with the list of accounts.
+
+    :return: list of dict
+        The accounts.
+    """
+    with open(file_location, "r") as file:
+        accounts = json.load(file)
+
+    for account in accounts:
+        if "AccountId" not in account or "RoleArn" not in account:
+            raise ValueError(f"Account entry needs an AccountId and a RoleArn: {account}")
+        if "InstanceIds" not in account and "Filters" not in account:
+            raise ValueError(f"Account {account['AccountId']} needs InstanceIds or Filters")
+    return accounts
+
+
+def select_instance_ids(account):
+    """
+    Get the IDs of the EC2 instances selected for an account.
+
+    :param account: dict
+        The account entry, with InstanceIds or describe_instances Filters. Unless the
+        Filters select instance states themselves, only running and stopped instances match.
+
+    :return: list
+        The selected instance IDs.
+    """
+    if "InstanceIds" in account:
+        return list(account["InstanceIds"])
+
+    # Terminated and shutting-down instances stay visible for a while but cannot be imaged
+    filters = list(account["Filters"])
+    if not any(instance_filter["Name"] == "instance-state-name" for instance_filter in filters):
+        filters.append({"Name": "instance-state-name", "Values": MIGRATABLE_INSTANCE_STATES})
+
+    ec2_client = data.get_ec2_client()
+    instance_ids = []
+    request = {"Filters": filters}
+    while True:
+        response = ec2_client.describe_instances(**request)
+        for reservation in response.get("Reservations", []):
+            for instance in reservation["Instances"]:
+                instance_ids.append(instance["InstanceId"])
+        if not response.get("NextToken"):
+            break
+        request["NextToken"] = response["NextToken"]
+    return instance_ids
+
+
+def migrate_account(account, render_mode="per-instance", save_snapshot=True, workers=1):
+    """
+    Migrate the selected instances of one account with the credentials of its role.
+
+    Meant to run in its own worker process: the module settings are pointed at the account,
+    so its audit files go to audit/<AccountId>, its Terraform files to terraform/<AccountId>,
+    its Terraform state keys include the account ID and its AWS provider assumes its role.
+
+    :param account: dict
+        The account entry.
+
+    :param render_mode: str
+        The Terraform render mode, see create_tf_files_functions.render_terraform_files.
+
+    :param save_snapshot: bool
+        Whether to save the formatted resources to the audit directory of the account.
+
+    :param workers: int
+        The number of worker processes rendering the VPCs of the account.
+
+    :return: dict
+        The AccountId and the number of migrated instances.
+    """
+    account_id = account["AccountId"]
+    data.AWS_DEFAULT_REGION = account.get("SourceRegion", BASE_SETTINGS["SourceRegion"])
+    credentials = AssumedRoleCredentials(account["RoleArn"], data.AWS_DEFAULT_REGION)
+
+    data.set_ec2_client_factory(credentials.ec2_client)
+    data.DESTINATION_REGION = account.get("DestinationRegion", BASE_SETTINGS["DestinationRegion"])
+    data.MAX_CONCURRENT_COPIES = account.get("MaxConcurrentCopies", BASE_SETTINGS["MaxConcurrentCopies"])
+    os.environ["DESTINATION_REGION"] = data.DESTINATION_REGION or ""
+    # The AWS provider of the rendered Terraform assumes the same role to apply in the account
+    os.environ["ASSUME_ROLE_ARN"] = account["RoleArn"]
+    if BASE_SETTINGS["BackendKey"]:
+        os.environ["KEY"] = f"{account_id}/{BASE_SETTINGS['BackendKey']}"
+
+    audit.AUDIT_DIRECTORY = os.path.join(BASE_SETTINGS["AuditDirectory"], account_id)
+    audit.current_run_id = None
+    tf.TERRAFORM_DIRECTORY = os.path.join(BASE_SETTINGS["TerraformDirectory"], account_id)
+
+    instance_ids = select_instance_ids(account)
+    if not instance_ids:
+        print(f"No instances selected in account {account_id}.")
+        return {"AccountId": account_id, "Instances": 0}
+
+    formatted_info = data.migrate_instance_images(instance_ids, account.get("GroupByTag"), save_snapshot)
+    tf.render_terraform_files(tf.iter_inventory_vpcs(formatted_info), render_mode, workers)
+
+    return {"AccountId": account_id, "Instances": len(instance_ids)}
@@ -0,0 +1,289 @@
+import os
+import json
+import tarfile
+from datetime import datetime
+
+AUDIT_DIRECTORY = os.path.join(os.path.dirname(__file__), "..", "audit")
+RUNS_DIRECTORY_NAME = "runs"
+ARCHIVE_DIRECTORY_NAME = "archive"
+LATEST_RUN_FILE_NAME = "latest.json"
+
+current_run_id = None
+
+
+def get_runs_directory():
+    """
+    Get the directory holding the per-run manifest files.
+
+    :return: str
+        The path to the runs directory inside the audit directory.
+    """
+    return os.path.join(AUDIT_DIRECTORY, RUNS_DIRECTORY_NAME)
+
+
+def get_run_manifest_path(run_id):
+    """
+    Get the path of the manifest file of a run.
+
+    :param run_id: str
+        The ID of the audit run.
+
+    :return: str
+        The path to the run manifest file.
+    """
+    return os.path.join(get_runs_directory(), f"{run_id}.jsonl")
+
+
+def start_audit_run():
+    """
+    Start a new audit run.
+
+    Every audit file saved afterwards is recorded in the manifest of this run. The run
+    only becomes the latest one once it records a formatted snapshot, so a run without a
+    snapshot, or one that stopped before saving it, never hides the previous snapshot.
+
+    :return: str
+        The ID of the new audit run.
+    """
+    global current_run_id
+
+    run_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+    os.makedirs(get_runs_directory(), exist_ok=True)
+
+    # Create the empty manifest so that runs without records are still listed
+    open(get_run_manifest_path(run_id), "a").close()
+
+    current_run_id = run_id
+    return run_id
+
+
+def write_latest_run(latest_run):
+    """
+    Write the pointer to the latest audit run with a formatted snapshot.
+
+    :param latest_run: dict
+        The RunId of the run and the file name of its formatted snapshot.
+
+    :return: None
+    """
+    latest_path = os.path.join(AUDIT_DIRECTORY, LATEST_RUN_FILE_NAME)
+    temporary_path = latest_path + ".tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(latest_run, file, indent=4)
+    os.replace(temporary_path, latest_path)
+
+
+def get_latest_run():
+    """
+    Read the pointer to the latest audit run with a formatted snapshot.
+
+    :return: dict
+        The RunId and Formatted file name of the run, or None if no snapshot was recorded.
+    """
+    latest_path = os.path.join(AUDIT_DIRECTORY, LATEST_RUN_FILE_NAME)
+    try:
+        with open(latest_path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError as e:
+        print(f"JSON decoding error in {latest_path}: {e}")
+        return None
+
+
+def record_audit_file(resource_id, resource_type, file_path):
+    """
+    Record a saved audit file in the manifest of the current run.
+
+    A run is started on demand when no run is active. Recording the formatted
+    snapshot also updates the latest run pointer.
+
+    :param resource_id: str
+        The ID of the AWS resource.
+
+    :param resource_type: str
+        The type of the AWS resource (e.g., "ec2-instance", "vpc", "formatted").
+
+    :param file_path: str
+        The path of the saved audit file.
+
+    :return: None
+    """
+    if current_run_id is None:
+        start_audit_run()
+
+    file_name = os.path.basename(file_path)
+    record = {
+        "ResourceType": resource_type,
+        "ResourceId": resource_id,
+        "File": file_name
+    }
+    with open(get_run_manifest_path(current_run_id), "a") as file:
+        file.write(json.dumps(record) + "\n")
+
+    if resource_type == "formatted":
+        write_latest_run({"RunId": current_run_id, "Formatted": file_name})
+
+
+def read_run_manifest(run_id):
+    """
+    Read the records of an audit run.
+
+    :param run_id: str
+        The ID of the audit run.
+
+    :return: list of dict
+        The records saved during the run, in the order they were saved.
+    """
+    records = []
+    with open(get_run_manifest_path(run_id), "r") as file:
+        for line in file:
+            if line.strip():
+                records.append(json.loads(line))
+    return records
+
+
+def list_audit_runs():
+    """
+    List the IDs of the audit runs that have not been compacted, oldest first.
+
+    :return: list of str
+        The audit run IDs.
+    """
+    try:
+        manifest_files = os.listdir(get_runs_directory())
+    except FileNotFoundError:
+        return []
+    return sorted(file[:-len(".jsonl")] for file in manifest_files if file.endswith(".jsonl"))
+
+
+def get_latest_formatted_file():
+    """
+    Get the path of the formatted snapshot of the latest audit run.
+
+    Falls back to the newest "formatted" file in the audit directory only for audit
+    directories written before run manifests existed, which have no latest run pointer.
+
+    :return: str
+        The path to the formatted snapshot, or None if there is none.
+    """
+    if os.path.exists(os.path.join(AUDIT_DIRECTORY, LATEST_RUN_FILE_NAME)):
+        latest_run = get_latest_run()
+        if not latest_run or not latest_run.get("Formatted"):
+            print("The latest audit run has no formatted snapshot.")
+            return None
+        return os.path.join(AUDIT_DIRECTORY, latest_run["Formatted"])
+
+    try:
+        files_in_audit = os.listdir(AUDIT_DIRECTORY)
+    except FileNotFoundError:
+        return None
+
+    # File names end with their timestamp, so the newest one sorts last
+    formatted_files = sorted(file for file in files_in_audit if file.startswith("formatted"))
+    if not formatted_files:
+        return None
+    return os.path.join(AUDIT_DIRECTORY, formatted_files[-1])
+
+
+def compact_audit_run(run_id):
+    """
+    Pack the manifest and audit files of a run into a compressed archive and remove them.
+
+    :param run_id: str
+        The ID of the audit run.
+
+    :return: str
+        The path to the created archive.
+    """
+    archive_directory = os.path.join(AUDIT_DIRECTORY, ARCHIVE_DIRECTORY_NAME)
+    os.makedirs(archive_directory, exist_ok=True)
+    archive_path = os.path.join(archive_directory, f"{run_id}.tar.gz")
+    manifest_path = get_run_manifest_path(run_id)
+
+    file_paths = []
+    for record in read_run_manifest(run_id):
+        file_path = os.path.join(AUDIT_DIRECTORY, record["File"])
+        if os.path.exists(file_path):
+            file_paths.append(file_path)
+
+    with tarfile.open(archive_path, "w:gz") as archive:
+        archive.add(manifest_path, arcname=os.path.basename(manifest_path))
+        for file_path in file_paths:
+            archive.add(file_path, arcname=os.path.basename(file_path))
+
+    for file_path in file_paths:
+        os.remove(file_path)
+    os.remove(manifest_path)
+
+    return archive_path
+
+
+def compact_audit_runs(runs_to_keep):
+    """
+    Compact every audit run except the newest ones.
+
+    :param runs_to_keep: int
+        The number of newest runs to leave untouched.
+
+    :return: list of str
+        The paths to the created archives.
+    """
+    runs = list_audit_runs()
+    latest_run = get_latest_run()
+    latest_run_id = latest_run.get("RunId") if latest_run else None
+
+    runs_to_compact = runs[:max(len(runs) - runs_to_keep, 0)]
+    archives = []
+    for run_id in runs_to_compact:
+        # Never archive the run that create_tf_files would read
+        if run_id == latest_run_id:
+            continue
+        archives.append(compact_audit_run(run_id))
+        print(f"Audit run {run_id} compacted.")
+    return archives
+
+
+def list_account_audit_directories():
+    """
+    List the accounts with their own audit directory, as written by migrate_accounts.py.
+
+    :return: list of str
+        The account IDs, i.e. the subdirectories of the audit directory holding audit runs.
+    """
+    try:
+        entries = os.listdir(AUDIT_DIRECTORY)
+    except FileNotFoundError:
+        return []
+    return sorted(entry for entry in entries
+                  if entry not in (RUNS_DIRECTORY_NAME, ARCHIVE_DIRECTORY_NAME)
+                  and os.path.isdir(os.path.join(AUDIT_DIRECTORY, entry, RUNS_DIRECTORY_NAME)))
+
+
+def compact_account_audit_runs(runs_to_keep, account_ids=None):
+    """
+    Compact the audit runs of each account except the newest ones.
+
+    :param runs_to_keep: int
+        The number of newest runs of each account to leave untouched.
+
+    :param account_ids: list of str
+        The accounts to compact, or None for every account with an audit directory.
+
+    :return: list of str
+        The paths to the created archives.
+    """
+    global AUDIT_DIRECTORY
+
+    base_directory = AUDIT_DIRECTORY
+    if account_ids is None:
+        account_ids = list_account_audit_directories()
+
+    archives = []
+    try:
+        for account_id in account_ids:
+            AUDIT_DIRECTORY = os.path.join(base_directory, account_id)
+            archives.extend(compact_audit_runs(runs_to_keep))
+    finally:
+        AUDIT_DIRECTORY = base_directory
+    return archives
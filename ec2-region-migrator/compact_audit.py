@@ -0,0 +1,24 @@
+import argparse
+import audit_functions as audit
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pack old audit runs into compressed archives under audit/archive and "
+                    "audit/<AccountId>/archive.")
+    parser.add_argument("--keep", type=int, default=5,
+                        help="Number of newest audit runs to leave uncompressed (default: 5).")
+    parser.add_argument("--account", action="append", dest="accounts", metavar="ACCOUNT_ID",
+                        help="Only compact the runs of this account, as written by migrate_accounts.py. "
+                             "Can be repeated. By default every account and the top-level runs are compacted.")
+    args = parser.parse_args()
+
+    archives = []
+    if args.accounts is None:
+        archives.extend(audit.compact_audit_runs(args.keep))
+    archives.extend(audit.compact_account_audit_runs(args.keep, args.accounts))
+    print(f"{len(archives)} audit run(s) compacted.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,199 @@
 import os
 import json
-from ipaddress import ip_network
+import argparse
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import terraform_templates.resource_templates as var
+import profiling_functions as prof
+import tracing_functions as tracing
 
+TERRAFORM_DIRECTORY = os.path.join(os.path.dirname(__file__), '..', "terraform")
+RENDER_MODES = ["per-instance", "for-each"]
 
-def create_vpc_module(vpc_module_template, index):
+
+def format_tf_template(template, args={}):
     """
-    Create a Terraform module for VPC configuration.
+    Fill the placeholders of a Terraform template.
 
-    :param vpc_module_template: str
-        The Terraform template for the VPC module.
+    :param template: str
+        The Terraform template.
 
-    :param index: int
-        The index of the VPC module.
+    :param args: dict
+        The arguments to fill the placeholders in the template.
 
-    :return: None
+    :return: str
+        The formatted template, with single quotes turned into double quotes.
     """
-    output_directory = os.path.join(
-        os.path.dirname(__file__), '..', "terraform")
-    vpc_directory = os.path.join(output_directory, f"vpc-{index}")
-    os.makedirs(vpc_directory, exist_ok=True)
-    output_file_path = os.path.join(vpc_directory, "vpc-module.tf")
-    append_data_to_file(output_file_path, vpc_module_template)
+    with prof.profile_phase("render"):
+        return (template % args).replace("'", "\"")
 
 
-def create_tf_file(vpc_name, filename, vpc_variables_template, args={}):
+def iter_json_file_items(file_location, chunk_size=65536):
     """
-    Create a Terraform variables file with the provided arguments.
+    Read a JSON file holding one object and yield its top-level items one at a time.
 
-    :param vpc_name: str
-        The name of the VPC.
+    Only the item being decoded is held in memory, so a formatted snapshot can be
+    processed one VPC at a time instead of loading the whole tree.
 
-    :param filename: str
-        The name of the Terraform variables file.
+    :param file_location: str
+        The path to the JSON file.
 
-    :param vpc_variables_template: str
-        The Terraform template for variables.
+    :param chunk_size: int
+        The number of characters read from the file at a time.
 
-    :param args: dict
-        The arguments to fill the placeholders in the template.
+    :return: generator of tuple
+        The (key, value) pairs of the top-level object, in file order.
 
-    :return: None
+    :raises FileNotFoundError: If the file does not exist.
+    :raises json.JSONDecodeError: If the file is not one complete JSON object, so that a
+        truncated snapshot is never mistaken for a smaller one.
     """
-    output_directory = os.path.join(
-        os.path.dirname(__file__), '..', "terraform")
-    vpc_directory = os.path.join(output_directory, vpc_name)
-    formatted_template = vpc_variables_template % args
-    output_file_path = os.path.join(vpc_directory, filename)
-    append_data_to_file(
-        output_file_path, formatted_template.replace("'", "\""))
+    decoder = json.JSONDecoder()
+    with open(file_location, 'r') as file:
+        buffer = ""
+        position = 0
+        end_of_file = False
+
+        def read_more():
+            nonlocal buffer, position, end_of_file
+            # Read at least as much as is buffered so that decoding a large item stays linear
+            chunk = file.read(max(chunk_size, len(buffer) - position))
+            if not chunk:
+                end_of_file = True
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        def next_token():
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position].isspace():
+                    position += 1
+                if position < len(buffer) or end_of_file:
+                    return buffer[position:position + 1]
+                read_more()
+
+        def decode_value():
+            nonlocal position
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # A number at the end of the buffer, or followed by the start of its
+                    # fraction or exponent, may continue in the next chunk
+                    if end_of_file or (end < len(buffer) and buffer[end] not in ".eE"):
+                        position = end
+                        return value
+                except json.JSONDecodeError:
+                    if end_of_file:
+                        raise
+                read_more()
+
+        if next_token() != "{":
+            raise json.JSONDecodeError("Expecting '{'", buffer, position)
+        position += 1
+
+        if next_token() == "}":
+            return
+        while True:
+            next_token()
+            key = decode_value()
+            if next_token() != ":":
+                raise json.JSONDecodeError("Expecting ':' delimiter", buffer, position)
+            position += 1
+            next_token()
+            yield key, decode_value()
+
+            separator = next_token()
+            position += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position - 1)
+
+
+def normalize_vpc_info(vpc_info):
+    """
+    Convert a VPC of a version 1 formatted snapshot to the current schema.
+
+    Version 1 snapshots embed the full security groups in every instance under
+    SecurityGroupsDetails; they are moved to the SecurityGroups table of the VPC and
+    replaced by SecurityGroupIds.
 
+    :param vpc_info: dict
+        The formatted VPC information, updated in place.
 
-def json_file_to_dict(file_location):
+    :return: dict
+        The VPC information in the current schema.
+    """
+    security_groups = vpc_info.setdefault('SecurityGroups', {})
+    for subnet_info in vpc_info['Subnets'].values():
+        for instance_info in subnet_info['EC2Instances'].values():
+            if 'SecurityGroupsDetails' not in instance_info:
+                continue
+            sg_details = instance_info.pop('SecurityGroupsDetails')
+            for sg_detail in sg_details:
+                security_groups.setdefault(sg_detail['Id'], sg_detail)
+            instance_info['SecurityGroupIds'] = [sg_detail['Id'] for sg_detail in sg_details]
+    return vpc_info
+
+
+def iter_inventory_vpcs(formatted_info):
     """
-    Read a JSON file and convert it to a dictionary.
+    Iterate over the VPCs of a formatted inventory, in the current schema.
+
+    The SchemaVersion key is skipped. Inventories without it are version 1 and are
+    converted as they are iterated.
+
+    :param formatted_info: dict or iterable of tuple
+        The formatted inventory, as returned by get_data_functions.migrate_instance_images,
+        or its (key, value) pairs in order.
+
+    :return: generator of tuple
+        The (VPC ID, VPC information) pairs of the inventory.
+    """
+    items = formatted_info.items() if isinstance(formatted_info, dict) else formatted_info
+    schema_version = 1
+    for key, value in items:
+        if key == "SchemaVersion":
+            schema_version = value
+            continue
+        if schema_version < 2:
+            value = normalize_vpc_info(value)
+        yield key, value
+
+
+def iter_formatted_vpcs(file_location):
+    """
+    Read a formatted snapshot one VPC at a time, in the current schema.
 
     :param file_location: str
-        The path to the JSON file.
+        The path to the formatted snapshot.
 
-    :return: dict
-        The dictionary containing the JSON data, or None if there was an error.
+    :return: generator of tuple
+        The (VPC ID, VPC information) pairs of the snapshot, see iter_inventory_vpcs.
+    """
+    return iter_inventory_vpcs(iter_json_file_items(file_location))
+
+
+def write_data_to_file(file_path, data):
+    """
+    Write data to a file, replacing its content.
+
+    :param file_path: str
+        The path to the file.
+
+    :param data: str
+        The data to be written to the file.
+
+    :return: None
     """
     try:
-        with open(file_location, 'r') as file:
-            # Use json.load to read the JSON file and convert it to a dictionary
-            data_dict = json.load(file)
-            return data_dict
-    except FileNotFoundError:
-        print(f"File not found: {file_location}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"JSON decoding error: {e}")
-        return None
+        with prof.profile_phase("write"), open(file_path, 'w') as file:
+            # Write the data and add a newline character
+            file.write(data + '\n')
+        print(f"Data written to {file_path} successfully.")
+    except Exception as e:
+        print(f"Error writing data to {file_path}: {e}")
 
 
 def append_data_to_file(file_path, data):
@@ -87,7 +209,7 @@ def append_data_to_file(file_path, data):
     :return: None
     """
     try:
-        with open(file_path, 'a') as file:
+        with prof.profile_phase("write"), open(file_path, 'a') as file:
             # Append the data and add a newline character
             file.write(data + '\n')
         print(f"Data appended to {file_path} successfully.")
@@ -140,6 +262,27 @@ def extract_ec2_instance_info(instance_info, subnet_info, instance_index):
     return ec2_args
 
 
+def extract_ec2_instance_for_each_info(instance_info, subnet_index):
+    """
+    Extract the values of an EC2 instance for the "ec2_instances" for_each variable.
+
+    :param instance_info: dict
+        The formatted EC2 instance information.
+
+    :param subnet_index: int
+        The position of the instance subnet in the VPC public subnets.
+
+    :return: dict
+        The ami, instance_type, subnet_index and tags of the instance.
+    """
+    return {
+        "ami": instance_info['ImageId'],
+        "instance_type": instance_info['InstanceType'],
+        "subnet_index": subnet_index,
+        "tags": {tag.get("Key", ""): tag.get("Value", "") for tag in instance_info.get('Tags', [])}
+    }
+
+
 def format_sg_rules(rules, template):
     """Format a list of security group rules for Terraform configuration."""
     formatted_rules = []
@@ -182,6 +325,233 @@ def extract_security_group_info(sg_info, index):
     return sg_args
 
 
+def add_render_arguments(parser):
+    """
+    Add the command-line arguments of the Terraform rendering step to a parser.
+
+    :param parser: argparse.ArgumentParser
+        The parser to extend.
+
+    :return: None
+    """
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default="per-instance",
+                        help="Write one module block per instance (per-instance, the default) or a single "
+                             "for_each module fed by ec2-instances.auto.tfvars.json (for-each).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes rendering VPCs in parallel (default: 1).")
+
+
+def get_create_tf_files_args():
+    """
+    Parse the command-line arguments of create_tf_files.
+
+    :return: argparse.Namespace
+        The render mode, and the profiling and tracing options.
+    """
+    parser = argparse.ArgumentParser(
+        description="Create the Terraform files of the latest formatted snapshot in the audit directory.")
+    add_render_arguments(parser)
+    prof.add_profiling_arguments(parser)
+    tracing.add_tracing_arguments(parser)
+    return parser.parse_args()
+
+
+def render_vpc_stack(vpc_data, render_mode, destination_region, backend_config, assume_role_arn=None):
+    """
+    Render the Terraform files of one VPC without writing them.
+
+    The function only depends on its arguments, so VPCs can be rendered in worker processes.
+
+    :param vpc_data: dict
+        The formatted VPC information, in the current schema.
+
+    :param render_mode: str
+        "per-instance" or "for-each", see render_terraform_files.
+
+    :param destination_region: dict
+        The destination region, as returned by get_destination_region.
+
+    :param backend_config: list
+        The S3 bucket name, key and DynamoDB table name, as returned by get_backend_config.
+
+    :param assume_role_arn: str
+        The role the AWS provider assumes to reach the account of the instances, or None
+        to use the credentials running Terraform.
+
+    :return: tuple
+        The VPC name and the list of (file name, content, file mode) to write, in order.
+    """
+    bucket_name, key, dynamodb_table = backend_config
+    files = []
+
+    with prof.profile_phase("render"):
+        vpc_args = extract_vpc_info(vpc_data)
+    vpc_name = f"vpc-{vpc_args['index']}"
+    files.append(("vpc-module.tf", var.vpc_module_template, "a"))
+
+    # Check if any of the required arguments are absent or empty
+    if not all([vpc_name, bucket_name, key, destination_region["Region"], dynamodb_table]):
+        print("One or more required arguments are missing or invalid. Skipping backend configuration.")
+    else:
+        try:
+            # Format the arguments for the Terraform backend configuration
+            backend_args = format_terraform_backend_args(vpc_name, bucket_name, key, destination_region["Region"], dynamodb_table)
+
+            # Render the Terraform backend configuration file
+            files.append(("versions.tf", format_tf_template(var.terraform_backend_template, backend_args), "a"))
+
+        except KeyError as e:
+            print(f"Missing argument in backend arguments: {e}")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+
+    # Render the VPC related files
+    files.append(("vpc-variabels.tf", format_tf_template(var.vpc_variables_template, vpc_args), "a"))
+    files.append(("vpc.auto.tfvars", format_tf_template(var.vpc_auto_tfvars_template, vpc_args), "a"))
+    files.append(("generic-variables.tf", format_tf_template(var.generic_variables_template, destination_region), "a"))
+    files.append(("terraform.tfvars", format_tf_template(var.terraform_tfvars_template, destination_region), "a"))
+    if assume_role_arn:
+        files.append(("versions.tf", format_tf_template(var.versions_assume_role_template,
+                                                        {"RoleArn": assume_role_arn}), "a"))
+    else:
+        files.append(("versions.tf", format_tf_template(var.versions_template), "a"))
+
+    ec2_instance_index = 1
+    ec2_instances_variables = {}
+
+    for subnet_index, (subnet_id, subnet_data) in enumerate(vpc_data['Subnets'].items()):
+        for instance_id, instance_data in subnet_data['EC2Instances'].items():
+            if render_mode == "for-each":
+                with prof.profile_phase("render"):
+                    ec2_instances_variables[f"instance-{ec2_instance_index}"] = \
+                        extract_ec2_instance_for_each_info(instance_data, subnet_index)
+            else:
+                with prof.profile_phase("render"):
+                    ec2_args = extract_ec2_instance_info(instance_data, subnet_data, ec2_instance_index)
+
+                files.append(("ec2-instances.tf", format_tf_template(var.ec2_instance_module_template, ec2_args), "a"))
+                files.append(("eip-resources.tf",
+                              format_tf_template(var.eip_resource_template, {"index": ec2_instance_index}), "a"))
+            ec2_instance_index += 1
+
+    if render_mode == "for-each":
+        # One module and one Elastic IP resource iterate over the instances in the JSON variables file
+        files.append(("ec2-instances.tf", format_tf_template(var.ec2_instances_for_each_template), "a"))
+        files.append(("ec2-instances-variables.tf", format_tf_template(var.ec2_instances_variables_template), "a"))
+        files.append(("eip-resources.tf", format_tf_template(var.eip_for_each_template), "a"))
+        with prof.profile_phase("render"):
+            tfvars_json = json.dumps({"ec2_instances": ec2_instances_variables}, indent=2)
+        files.append(("ec2-instances.auto.tfvars.json", tfvars_json, "w"))
+
+    # Render the security group configurations
+    for sg_index, sg_detail in enumerate(vpc_data['SecurityGroups'].values(), start=1):
+        with prof.profile_phase("render"):
+            sg_args = extract_security_group_info(sg_detail, sg_index)
+        files.append(("security-groups.tf", format_tf_template(var.security_group_resource_template, sg_args), "a"))
+
+    return vpc_name, files
+
+
+def write_vpc_stack(vpc_name, files):
+    """
+    Write the rendered Terraform files of one VPC to its directory.
+
+    :param vpc_name: str
+        The name of the VPC.
+
+    :param files: list of tuple
+        The (file name, content, file mode) to write, in order. Mode "a" appends to the
+        file and "w" replaces it.
+
+    :return: None
+    """
+    output_directory = TERRAFORM_DIRECTORY
+    vpc_directory = os.path.join(output_directory, vpc_name)
+    os.makedirs(vpc_directory, exist_ok=True)
+    for filename, content, file_mode in files:
+        output_file_path = os.path.join(vpc_directory, filename)
+        if file_mode == "w":
+            write_data_to_file(output_file_path, content)
+        else:
+            append_data_to_file(output_file_path, content)
+
+
+def render_terraform_files(vpc_items, render_mode="per-instance", workers=1):
+    """
+    Create the Terraform files of every VPC of a formatted inventory.
+
+    With more than one worker, each VPC is rendered in a worker process while the files
+    are written by this process in inventory order, so the output is the same as with a
+    single worker. At most two VPCs per worker are read ahead of the one being written.
+
+    :param vpc_items: iterable of tuple
+        The (VPC ID, VPC information) pairs of the inventory, in the current schema.
+
+    :param render_mode: str
+        "per-instance" to write one module block per instance, or "for-each" to write a
+        single for_each module fed by ec2-instances.auto.tfvars.json.
+
+    :param workers: int
+        The number of worker processes rendering VPCs; 1 renders in this process.
+
+    :return: None
+    """
+    destination_region = get_destination_region()
+    backend_config = get_backend_config()
+    assume_role_arn = get_assume_role_arn()
+
+    if workers <= 1:
+        for vpc_id, vpc_data in vpc_items:
+            start_time = time.time()
+            vpc_name, files = render_vpc_stack(vpc_data, render_mode, destination_region, backend_config,
+                                               assume_role_arn)
+            write_vpc_stack(vpc_name, files)
+            tracing.record_span(vpc_name, "render", start_time, time.time(), Instances=get_instance_ids(vpc_data))
+        return
+
+    # The render span of a VPC runs from its submission to the end of its writing
+    # Forked workers would inherit an enabled profiler whose statistics are never collected
+    with ProcessPoolExecutor(max_workers=workers, initializer=prof.disable_profiling) as executor:
+        pending = deque()
+        for vpc_id, vpc_data in vpc_items:
+            future = executor.submit(render_vpc_stack, vpc_data, render_mode, destination_region, backend_config,
+                                     assume_role_arn)
+            pending.append((future, time.time(), get_instance_ids(vpc_data)))
+            if len(pending) >= 2 * workers:
+                write_pending_vpc_stack(pending.popleft())
+        while pending:
+            write_pending_vpc_stack(pending.popleft())
+
+
+def write_pending_vpc_stack(pending_vpc_stack):
+    """
+    Write the files of a VPC rendered in a worker process and trace its rendering.
+
+    :param pending_vpc_stack: tuple
+        The future of render_vpc_stack, its submission time and the instance IDs of the VPC.
+
+    :return: None
+    """
+    future, start_time, instance_ids = pending_vpc_stack
+    vpc_name, files = future.result()
+    write_vpc_stack(vpc_name, files)
+    tracing.record_span(vpc_name, "render", start_time, time.time(), Instances=instance_ids)
+
+
+def get_instance_ids(vpc_data):
+    """
+    Get the IDs of the EC2 instances of a formatted VPC.
+
+    :param vpc_data: dict
+        The formatted VPC information.
+
+    :return: list
+        The instance IDs.
+    """
+    return [instance_id for subnet_data in vpc_data['Subnets'].values()
+            for instance_id in subnet_data['EC2Instances']]
+
+
 def get_destination_region():
     region = os.getenv("DESTINATION_REGION")
     region_arg = {
@@ -189,6 +559,15 @@ def get_destination_region():
     }
     return region_arg
 
+def get_assume_role_arn():
+    """
+    Retrieves the role the AWS provider assumes from the ASSUME_ROLE_ARN environment variable.
+
+    :return: str
+        The role ARN, or None when Terraform runs with the credentials of the caller.
+    """
+    return os.getenv("ASSUME_ROLE_ARN") or None
+
 def get_backend_config():
     """
     Retrieves backend configuration details from environment variables.
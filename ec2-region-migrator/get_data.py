@@ -1,43 +1,21 @@
-import os
-from datetime import datetime
-import boto3
-import json
-from time import sleep
 import get_data_functions as data
+import profiling_functions as prof
+import tracing_functions as tracing
 
-DESTINATION_REGION = os.getenv("DESTINATION_REGION")
-AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION")
 
 def main():
-    ec2_instance_ids = data.get_ec2_instance_ids_from_args()
-    ami_list = []
+    args = data.get_get_data_args()
+    if args.profile:
+        prof.enable_profiling(args.profile_dir)
 
-    # Creates an Ami for each instance in the list
-    for instance_id in ec2_instance_ids:
-        response = ami_list.append(data.create_instance_image(instance_id, instance_id))
-    
-    # Wait for the availability of the new created AMIs
-    sleep(120)
+    if args.trace:
+        tracing.enable_tracing(args.trace)
 
-    # Copies each Ami to destination region
-    for ami in ami_list:
-        response = data.copy_instance_image(ami["ImageId"], ami["InstanceId"], AWS_DEFAULT_REGION, DESTINATION_REGION)
-        ami["ImageId"] = response["ImageId"]
-   
-    # Now, call the extract_ec2_resource_info function to get additional resource info
-    resource_info = data.extract_ec2_resource_info(ID_LIST)
+    # Saves the formatted resources to the audit directory for create_tf_files
+    data.migrate_instance_images(args.instance_ids, args.group_by_tag, save_snapshot=True)
 
-    # Adds imageid to the corresponding ec2 instance
-    data.add_image_id_to_instances(resource_info, ami_list)
+    prof.write_profile_report("get_data")
 
-    # Formats the resources information in a hierarchical format
-    data.format_ec2_resource_info(resource_info)
-
-    # Waits for the copied AMIs to be available
-    for ami in ami_list:
-        data.wait_for_image_availability(ami["ImageId"], DESTINATION_REGION)
-
-    
 
 if __name__ == "__main__":
     main()
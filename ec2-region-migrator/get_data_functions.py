@@ -1,12 +1,116 @@
 import os
-import sys
+import argparse
 import time
+import heapq
 from datetime import datetime
 import json
 import boto3
 from botocore.exceptions import ClientError
+import audit_functions as audit
+import profiling_functions as prof
+import tracing_functions as tracing
 
 
+def positive_int(value):
+    """
+    Parse a whole number of at least 1, for command-line arguments and settings such as
+    MAX_CONCURRENT_COPIES.
+
+    :param value: The text to parse.
+    :returns: The parsed number.
+    :raises argparse.ArgumentTypeError: If the value is not a whole number of at least 1.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a whole number")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value!r} must be at least 1")
+    return number
+
+
+DESTINATION_REGION = os.getenv("DESTINATION_REGION")
+AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION")
+MAX_CONCURRENT_COPIES = positive_int(os.getenv("MAX_CONCURRENT_COPIES", "50"))
+COPY_BASE_SECONDS = float(os.getenv("COPY_BASE_SECONDS", "300"))
+COPY_MIB_PER_SECOND = float(os.getenv("COPY_MIB_PER_SECOND", "50"))
+
+IMAGE_WAIT_DEADLINE_SECONDS = float(os.getenv("IMAGE_WAIT_DEADLINE_SECONDS", "86400"))
+
+FORMATTED_SCHEMA_VERSION = 2
+COPY_POLL_SECONDS = 30
+DESCRIBE_BATCH_SIZE = 100
+# Polls an AMI may be missing from DescribeImages before it is given up as not found
+IMAGE_NOT_FOUND_RETRIES = 10
+
+ec2_client_factory = None
+sleep_function = time.sleep
+clock_function = time.time
+
+
+def set_ec2_client_factory(factory):
+    """
+    Replace the function used to create EC2 clients.
+
+    :param factory: callable
+        A function taking a region name (None for the default region) and returning an
+        EC2 client, or None to go back to Boto3.
+
+    :return: None
+    """
+    global ec2_client_factory
+    ec2_client_factory = factory
+
+
+def set_time_functions(sleep, clock):
+    """
+    Replace the functions used to wait and to read the current time.
+
+    :param sleep: callable
+        A function taking a number of seconds to wait, such as time.sleep.
+
+    :param clock: callable
+        A function returning the current time in seconds, such as time.time.
+
+    :return: None
+    """
+    global sleep_function, clock_function
+    sleep_function = sleep
+    clock_function = clock
+
+
+def get_ec2_client(region_name=None):
+    """
+    Create an EC2 client for a region.
+
+    :param region_name: The region of the client, or None for the default region.
+    :returns: An EC2 client.
+    """
+    if ec2_client_factory is not None:
+        return ec2_client_factory(region_name)
+    if region_name is None:
+        return boto3.client("ec2")
+    return boto3.client("ec2", region_name=region_name)
+
+
+def pause(seconds):
+    """
+    Wait for the given number of seconds.
+
+    :param seconds: The number of seconds to wait.
+    :returns: None
+    """
+    sleep_function(seconds)
+
+
+def current_time():
+    """
+    Get the current time in seconds.
+
+    :returns: The current time in seconds.
+    """
+    return clock_function()
+
 
 def get_ec2_instance_data(instance_id):
     """
@@ -16,7 +120,7 @@ def get_ec2_instance_data(instance_id):
     :returns: A dictionary containing information about the specified EC2 instance.
     """
 
-    ec2 = boto3.client("ec2")
+    ec2 = get_ec2_client()
     response = ec2.describe_instances(InstanceIds=[instance_id])
     return response
 
@@ -28,7 +132,7 @@ def get_vpc_data(vpc_id):
     :param vpc_id: The ID of the VPC to retrieve information for.
     :returns: A dictionary containing information about the specified VPC.
     """
-    ec2 = boto3.client("ec2")
+    ec2 = get_ec2_client()
     response = ec2.describe_vpcs(VpcIds=[vpc_id])
     return response
 
@@ -40,7 +144,7 @@ def get_security_group_data(group_id):
     :param group_id: The ID of the security group to retrieve information for.
     :returns: A dictionary containing information about the specified security group.
     """
-    ec2 = boto3.client("ec2")
+    ec2 = get_ec2_client()
     response = ec2.describe_security_groups(GroupIds=[group_id])
     return response
 
@@ -52,7 +156,7 @@ def get_subnet_data(subnet_id):
     :param subnet_id: The ID of the subnet to retrieve information for.
     :returns: A dictionary containing information about the specified subnet.
     """
-    ec2 = boto3.client("ec2")
+    ec2 = get_ec2_client()
     response = ec2.describe_subnets(SubnetIds=[subnet_id])
     return response
 
@@ -257,6 +361,7 @@ def format_vpc_info(vpc_id, vpc_data):
         "VpcIndex": vpc_id,
         "CidrBlock": vpc_data["CidrBlock"],
         "Tags": vpc_data.get("Tags", []),
+        "SecurityGroups": {},
         "Subnets": {}
     }
 
@@ -307,6 +412,9 @@ def format_ec2_instance_info(instance_id, instance_data, security_groups):
     """
     Formats the EC2 instance information.
 
+    The security groups are referenced by ID; their details live in the SecurityGroups
+    table of the VPC.
+
     Args:
     instance_id (str): The ID of the EC2 instance.
     instance_data (dict): The data of the EC2 instance containing InstanceType, PrivateIpAddress, etc.
@@ -315,51 +423,68 @@ def format_ec2_instance_info(instance_id, instance_data, security_groups):
     Returns:
     dict: Formatted EC2 instance information.
     """
-    security_groups_details = [format_security_group_info(
-        sg_id, security_groups) for sg_id in instance_data.get("SecurityGroups", []) if sg_id in security_groups]
+    security_group_ids = [sg_id for sg_id in instance_data.get("SecurityGroups", []) if sg_id in security_groups]
     return {
         "InstanceType": instance_data["InstanceType"],
         "PrivateIpAddress": instance_data["PrivateIpAddress"],
         "Tags": instance_data.get("Tags", []),
-        "SecurityGroupsDetails": security_groups_details,
+        "SecurityGroupIds": security_group_ids,
         "ImageId": instance_data["ImageId"]
     }
 
 
-def format_ec2_resource_info(resource_info):
+def format_ec2_resource_info(resource_info, save_snapshot=True):
     """
     Formats the entire EC2 resource information including VPCs, subnets, EC2 instances, and security groups.
 
+    Each VPC holds a SecurityGroups table with the details of every security group attached to its
+    instances, and the instances reference those groups by ID. The SchemaVersion key comes first.
+
     Args:
     resource_info (dict): The raw resource data containing VPCs, subnets, EC2 instances, and security groups.
+    save_snapshot (bool): Whether to save the formatted information to the audit directory.
 
     Returns:
     dict: A dictionary containing formatted information of all resources.
     """
-    formatted_info = {}
+    security_groups = resource_info['security_groups']
+
+    # Index subnets by VPC and instances by subnet, keeping their discovery order
+    subnets_by_vpc = {}
+    for subnet_id, subnet_data in resource_info['subnets'].items():
+        subnets_by_vpc.setdefault(subnet_data['VpcId'], []).append((subnet_id, subnet_data))
+    instances_by_subnet = {}
+    for instance_id, instance_data in resource_info['ec2_instances'].items():
+        instances_by_subnet.setdefault(instance_data['SubnetId'], []).append((instance_id, instance_data))
+
+    formatted_info = {"SchemaVersion": FORMATTED_SCHEMA_VERSION}
     vpc_number = 1
     # Iterate over VPCs
     for vpc_id, vpc_data in resource_info['vpcs'].items():
         vpc_info = format_vpc_info(vpc_number, vpc_data)
 
         # Find subnets associated with this VPC
-        for subnet_id, subnet_data in resource_info['subnets'].items():
-            if subnet_data['VpcId'] == vpc_id:
-                subnet_info = format_subnet_info(subnet_id, subnet_data)
+        for subnet_id, subnet_data in subnets_by_vpc.get(vpc_id, []):
+            subnet_info = format_subnet_info(subnet_id, subnet_data)
 
-                # Find EC2 instances in this subnet
-                for instance_id, instance_data in resource_info['ec2_instances'].items():
-                    if instance_data['SubnetId'] == subnet_id:
-                        instance_info = format_ec2_instance_info(
-                            instance_id, instance_data, resource_info['security_groups'])
-                        subnet_info["EC2Instances"][instance_id] = instance_info
+            # Find EC2 instances in this subnet
+            for instance_id, instance_data in instances_by_subnet.get(subnet_id, []):
+                instance_info = format_ec2_instance_info(
+                    instance_id, instance_data, security_groups)
+                subnet_info["EC2Instances"][instance_id] = instance_info
 
-                vpc_info["Subnets"][subnet_id] = subnet_info
+                # Add each referenced security group to the VPC table once
+                for sg_id in instance_info["SecurityGroupIds"]:
+                    if sg_id not in vpc_info["SecurityGroups"]:
+                        vpc_info["SecurityGroups"][sg_id] = format_security_group_info(sg_id, security_groups)
+
+            vpc_info["Subnets"][subnet_id] = subnet_info
 
         vpc_number += 1
         formatted_info[vpc_id] = vpc_info
 
-    save_to_audit_file("", "formatted", formatted_info)
+    if save_snapshot:
+        save_to_audit_file("", "formatted", formatted_info)
 
     return formatted_info
 
@@ -369,26 +494,33 @@ def save_to_audit_file(resource_id, resource_type, data):
     Save data to a JSON file in the audit directory with a timestamp.
 
     This function takes resource ID, resource type, and data as input and saves the data to a JSON file in the audit directory.
-    The file name is constructed using the resource ID, type, and a timestamp.
+    The file name is constructed using the resource ID, type, and a timestamp, and the file is
+    recorded in the manifest of the current audit run.
 
     :param resource_id: The ID of the AWS resource.
     :param resource_type: The type of the AWS resource (e.g., "ec2", "vpc", "security_group").
     :param data: The data to be saved to the JSON file.
     :returns: None
     """
-    # Get the current timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    with prof.profile_phase("audit"):
+        # Get the current timestamp
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+        # Construct the file path with resource ID, type, and timestamp
+        file_path = os.path.join(
+            audit.AUDIT_DIRECTORY, f"{resource_type}_{resource_id}_{timestamp}.json")
 
-    # Construct the file path with resource ID, type, and timestamp
-    file_path = os.path.join(os.path.dirname(
-        __file__), "..", "audit", f"{resource_type}_{resource_id}_{timestamp}.json")
+        # Create the directory if it doesn"t exist
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-    # Create the directory if it doesn"t exist
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Save the data to a temporary file first so that an interrupted dump never leaves a partial file
+        temporary_path = file_path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(data, file, indent=4, default=str)
+        os.replace(temporary_path, file_path)
 
-    # Save the data to the JSON file
-    with open(file_path, "w") as file:
-        json.dump(data, file, indent=4, default=str)
+        # Record the file in the manifest of the current audit run
+        audit.record_audit_file(resource_id, resource_type, file_path)
 
 
 def create_instance_image(instance_id, image_name):
@@ -399,7 +531,7 @@ def create_instance_image(instance_id, image_name):
     :param image_name: The name for the new AMI.
     :return: The ID of the created AMI if successful, None otherwise.
     """
-    ec2_client = boto3.client('ec2')
+    ec2_client = get_ec2_client()
     response = ec2_client.create_image(InstanceId=instance_id, Name=image_name)
     response["InstanceId"] = instance_id
     save_to_audit_file(response["ImageId"], 'ami', response)
@@ -420,7 +552,7 @@ def copy_instance_image(image_id, image_name, source_region, destination_region)
     :return: str
         The ID of the copied AMI if successful, None otherwise.
     """
-    ec2_client = boto3.client('ec2', region_name=destination_region)
+    ec2_client = get_ec2_client(destination_region)
     response = ec2_client.copy_image(
         Description='',
         Name=image_name,
@@ -432,6 +564,293 @@ def copy_instance_image(image_id, image_name, source_region, destination_region)
     return response
 
 
+def get_instance_volumes(instance_ids):
+    """
+    Get the EBS volumes attached to each EC2 instance.
+
+    :param instance_ids: list
+        The IDs of the EC2 instances.
+    :return: dict
+        A list with the DeviceName, Size (GiB) and VolumeType of each attached volume,
+        keyed by instance ID.
+    """
+    ec2_client = get_ec2_client()
+    instance_volumes = {instance_id: [] for instance_id in instance_ids}
+
+    for start in range(0, len(instance_ids), DESCRIBE_BATCH_SIZE):
+        filters = [{"Name": "attachment.instance-id",
+                    "Values": instance_ids[start:start + DESCRIBE_BATCH_SIZE]}]
+        request = {"Filters": filters}
+        while True:
+            response = ec2_client.describe_volumes(**request)
+            for volume in response.get("Volumes", []):
+                for attachment in volume.get("Attachments", []):
+                    if attachment.get("InstanceId") in instance_volumes:
+                        instance_volumes[attachment["InstanceId"]].append({
+                            "DeviceName": attachment.get("Device", ""),
+                            "Size": volume.get("Size", 0),
+                            "VolumeType": volume.get("VolumeType", "")
+                        })
+            if not response.get("NextToken"):
+                break
+            request["NextToken"] = response["NextToken"]
+
+    return instance_volumes
+
+
+def get_instance_volume_sizes(instance_volumes):
+    """
+    Get the total size of the EBS volumes attached to each EC2 instance.
+
+    :param instance_volumes: dict
+        The volumes of each instance, as returned by get_instance_volumes.
+    :return: dict
+        The total volume size in GiB of each instance, keyed by instance ID.
+    """
+    return {instance_id: sum(volume["Size"] for volume in volumes)
+            for instance_id, volumes in instance_volumes.items()}
+
+
+def group_identical_instances(instance_ids, instance_volumes, tag_key):
+    """
+    Group EC2 instances that can share one AMI.
+
+    Instances are identical when they were launched from the same source ImageId, have the
+    same instance type and volume layout, and carry the same value for the given tag.
+    Instances without the tag are never grouped with others.
+
+    :param instance_ids: list
+        The IDs of the EC2 instances.
+    :param instance_volumes: dict
+        The volumes of each instance, as returned by get_instance_volumes.
+    :param tag_key: str
+        The tag marking interchangeable instances (e.g. "Role").
+    :return: dict
+        The IDs of the group members keyed by the ID of the group representative, which is
+        the first member in instance_ids order.
+    """
+    ec2_client = get_ec2_client()
+    instances = {}
+    for start in range(0, len(instance_ids), DESCRIBE_BATCH_SIZE):
+        response = ec2_client.describe_instances(InstanceIds=instance_ids[start:start + DESCRIBE_BATCH_SIZE])
+        for reservation in response.get("Reservations", []):
+            for instance in reservation["Instances"]:
+                instances[instance["InstanceId"]] = instance
+
+    groups = {}
+    representatives = {}
+    for instance_id in instance_ids:
+        instance = instances[instance_id]
+        tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
+        if tag_key not in tags:
+            groups[instance_id] = [instance_id]
+            continue
+
+        volume_layout = tuple(sorted((volume["DeviceName"], volume["Size"], volume["VolumeType"])
+                                     for volume in instance_volumes.get(instance_id, [])))
+        group_key = (instance.get("ImageId"), instance.get("InstanceType"), volume_layout, tags[tag_key])
+        if group_key in representatives:
+            groups[representatives[group_key]].append(instance_id)
+        else:
+            representatives[group_key] = instance_id
+            groups[instance_id] = [instance_id]
+
+    return groups
+
+
+def expand_group_images(ami_list, groups):
+    """
+    Give every member of an instance group the AMI copied for its representative.
+
+    :param ami_list: list
+        Dictionaries containing the ImageId and InstanceId of each representative AMI.
+    :param groups: dict
+        The IDs of the group members keyed by representative ID.
+    :return: list
+        Dictionaries containing the ImageId and InstanceId of every instance.
+    """
+    return [{"InstanceId": member_id, "ImageId": ami["ImageId"]}
+            for ami in ami_list for member_id in groups[ami["InstanceId"]]]
+
+
+def estimate_copy_seconds(size_gib, base_seconds, mib_per_second):
+    """
+    Estimate how long copying an AMI to another region takes.
+
+    :param size_gib: int
+        The total size of the AMI volumes in GiB.
+    :param base_seconds: float
+        The fixed time every copy takes regardless of its size.
+    :param mib_per_second: float
+        The throughput of a single copy in MiB per second.
+    :return: float
+        The expected copy time in seconds.
+    """
+    return base_seconds + size_gib * 1024 / mib_per_second
+
+
+def order_longest_copies_first(ami_list):
+    """
+    Sort AMIs so that the copies expected to take longest are started first.
+
+    Starting the longest copies first and letting the short ones fill the freed slots
+    keeps a large image from being the last one to start and holding up the wave.
+
+    :param ami_list: list
+        Dictionaries containing the ImageId, InstanceId and ExpectedCopySeconds of each AMI.
+    :return: list
+        The AMIs in copy order.
+    """
+    return sorted(ami_list, key=lambda ami: ami["ExpectedCopySeconds"], reverse=True)
+
+
+def predict_copy_makespan(ami_list, max_concurrent_copies):
+    """
+    Predict the time needed to copy AMIs in order with a limited number of copies in flight.
+
+    :param ami_list: list
+        Dictionaries containing the ExpectedCopySeconds of each AMI, in copy order.
+    :param max_concurrent_copies: int
+        The maximum number of copies in flight at the same time.
+    :return: float
+        The predicted time in seconds between the first copy start and the last copy end.
+    """
+    slot_end_times = [0.0] * max(max_concurrent_copies, 1)
+    for ami in ami_list:
+        # Each copy starts in the slot that frees up first
+        start = heapq.heappop(slot_end_times)
+        heapq.heappush(slot_end_times, start + ami["ExpectedCopySeconds"])
+    return max(slot_end_times)
+
+
+def get_image_states(image_ids, region):
+    """
+    Get the state of several AMIs in a region with a single request.
+
+    :param image_ids: list
+        The IDs of the AMIs.
+    :param region: str
+        The AWS region of the AMIs.
+    :return: dict
+        The state of each AMI found, keyed by its ID.
+    """
+    ec2_client = get_ec2_client(region)
+    response = ec2_client.describe_images(ImageIds=list(image_ids))
+    return {image["ImageId"]: image["State"] for image in response["Images"]}
+
+
+def poll_image_states(image_ids, region, not_found_polls):
+    """
+    Get the state of AMIs in batches, tolerating AMIs that are not visible yet.
+
+    A new AMI can be missing from DescribeImages for a short while. When a batch is rejected
+    with InvalidAMIID.NotFound, its AMIs are described one at a time so that only the missing
+    ones wait for the next poll. An AMI still missing after IMAGE_NOT_FOUND_RETRIES polls is
+    reported in the "not-found" state. Any state other than "pending" is final.
+
+    :param image_ids: list
+        The IDs of the AMIs.
+    :param region: str
+        The AWS region of the AMIs.
+    :param not_found_polls: dict
+        The number of polls each AMI has been missing for, updated across polls.
+    :return: dict
+        The state of each AMI found or given up, keyed by its ID.
+    """
+    image_ids = list(image_ids)
+    image_states = {}
+    for start in range(0, len(image_ids), DESCRIBE_BATCH_SIZE):
+        batch = image_ids[start:start + DESCRIBE_BATCH_SIZE]
+        try:
+            image_states.update(get_image_states(batch, region))
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "InvalidAMIID.NotFound":
+                raise
+            for image_id in batch:
+                try:
+                    image_states.update(get_image_states([image_id], region))
+                except ClientError as image_error:
+                    if image_error.response["Error"]["Code"] != "InvalidAMIID.NotFound":
+                        raise
+
+    for image_id in image_ids:
+        if image_id in image_states:
+            not_found_polls.pop(image_id, None)
+            continue
+        not_found_polls[image_id] = not_found_polls.get(image_id, 0) + 1
+        if not_found_polls[image_id] > IMAGE_NOT_FOUND_RETRIES:
+            image_states[image_id] = "not-found"
+        else:
+            print(f"Image {image_id} is not visible yet in {region}.")
+    return image_states
+
+
+def record_finished_images(pending, image_states, key_prefix):
+    """
+    Record the AMIs that are no longer pending and remove them from the pending AMIs.
+
+    :param pending: dict
+        The pending AMIs keyed by ImageId, updated in place.
+    :param image_states: dict
+        The polled state of the AMIs, as returned by poll_image_states.
+    :param key_prefix: str
+        The prefix of the "<key_prefix>EndTime" and "<key_prefix>State" keys set on each
+        finished AMI, e.g. "Source" or "Copy".
+    :return: list
+        The finished AMIs.
+    """
+    poll_time = current_time()
+    finished = []
+    for image_id, image_state in image_states.items():
+        if image_state == "pending":
+            continue
+        ami = pending.pop(image_id)
+        ami[f"{key_prefix}EndTime"] = poll_time
+        ami[f"{key_prefix}State"] = image_state
+        finished.append(ami)
+        if image_state == "available":
+            print(f"Image {image_id} is now available.")
+        else:
+            print(f"Image {image_id} is in '{image_state}' state and will not become available.")
+    return finished
+
+
+def copy_instance_images(ami_list, source_region, destination_region, max_concurrent_copies):
+    """
+    Copy AMIs to a different region without exceeding a number of copies in flight.
+
+    When the limit is reached, the in-flight copies are polled until one of them finishes
+    before the next copy is started. The copies started last are left in flight.
+
+    :param ami_list: list
+        Dictionaries containing the ImageId and InstanceId of each source AMI. Each ImageId
+        is replaced by the ID of its copy, and CopyStartTime is set, as well as CopyEndTime
+        and CopyState for the copies seen finishing.
+    :param source_region: str
+        The region where the source AMIs are located.
+    :param destination_region: str
+        The destination region to copy the AMIs to.
+    :param max_concurrent_copies: int
+        The maximum number of copies in flight at the same time.
+    :return: None
+    """
+    if max_concurrent_copies < 1:
+        raise ValueError(f"max_concurrent_copies must be at least 1, got {max_concurrent_copies}")
+
+    in_flight = {}
+    not_found_polls = {}
+    for ami in ami_list:
+        while len(in_flight) >= max_concurrent_copies:
+            image_states = poll_image_states(in_flight, destination_region, not_found_polls)
+            if not record_finished_images(in_flight, image_states, "Copy"):
+                pause(COPY_POLL_SECONDS)
+
+        ami["CopyStartTime"] = current_time()
+        response = copy_instance_image(ami["ImageId"], ami["InstanceId"], source_region, destination_region)
+        ami["ImageId"] = response["ImageId"]
+        in_flight[response["ImageId"]] = ami
+
+
 def add_image_id_to_instances(data, image_data_list):
     """
     Add ImageId to EC2 instances in the provided data dictionary by InstanceId.
@@ -451,57 +870,180 @@ def add_image_id_to_instances(data, image_data_list):
             ec2_instances[instance_id]["ImageId"] = image_info.get("ImageId")
 
 
-def get_ec2_instance_ids_from_args():
+def add_get_data_arguments(parser):
     """
-    Get EC2 instance IDs from command-line arguments and return them as a list.
+    Add the command-line arguments of the discovery and copy steps to a parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to extend.
+    """
+    parser.add_argument("instance_ids", nargs="+", metavar="EC2_INSTANCE_ID",
+                        help="ID of an EC2 instance to migrate.")
+    parser.add_argument("--group-by-tag", metavar="TAG_KEY",
+                        help="Create and copy one AMI per group of identical instances: same source image, "
+                             "instance type, volume layout and value of this tag.")
+
+
+def get_get_data_args():
+    """
+    Parse the command-line arguments of get_data.
 
     Returns:
-        list: A list of EC2 instance IDs.
+        argparse.Namespace: The EC2 instance IDs, the grouping tag, and the profiling and tracing options.
     """
-    # Check if at least one argument (EC2 instance ID) is provided
-    if len(sys.argv) < 2:
-        print(
-            "Usage: python your_script.py <EC2_INSTANCE_ID1> [<EC2_INSTANCE_ID2> ...]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Create AMIs of EC2 instances, copy them to the destination region and save their resources.")
+    add_get_data_arguments(parser)
+    prof.add_profiling_arguments(parser)
+    tracing.add_tracing_arguments(parser)
+    return parser.parse_args()
 
-    # Extract EC2 instance IDs from command-line arguments (skip the first argument)
-    ec2_instance_ids = sys.argv[1:]
-    return ec2_instance_ids
 
+def migrate_instance_images(ec2_instance_ids, group_by_tag=None, save_snapshot=True):
+    """
+    Image EC2 instances, copy the images to the destination region and format their resources.
 
-def wait_for_image_availability(image_id, region):
+    Args:
+        ec2_instance_ids (list): The IDs of the EC2 instances to migrate.
+        group_by_tag (str): The tag grouping identical instances that share one image, or None
+            to image every instance.
+        save_snapshot (bool): Whether to save the formatted resources to the audit directory.
+
+    Returns:
+        dict: The formatted resources, with the ImageId of the copied AMI on every instance.
     """
-    Check if the AMI with the given ImageId is available in the specified region
-    and wait for it to become available if it's not already.
+    ami_list = []
+
+    # Every audit file of this execution is recorded in a new run manifest
+    audit.start_audit_run()
+
+    with prof.profile_phase("discover"):
+        instance_volumes = get_instance_volumes(ec2_instance_ids)
+
+        # Only one instance of each group of identical instances is imaged and copied
+        if group_by_tag:
+            groups = group_identical_instances(ec2_instance_ids, instance_volumes, group_by_tag)
+            print(f"{len(ec2_instance_ids)} instances grouped into {len(groups)} images by tag {group_by_tag}")
+        else:
+            groups = {instance_id: [instance_id] for instance_id in ec2_instance_ids}
+
+    with prof.profile_phase("image"):
+        # Creates an Ami for each instance in the list
+        for instance_id in groups:
+            start_time = current_time()
+            ami = create_instance_image(instance_id, instance_id)
+            ami["CreateEndTime"] = current_time()
+            tracing.record_spans(groups[instance_id], "create_image", start_time, ami["CreateEndTime"],
+                                 Representative=instance_id)
+            ami_list.append(ami)
+
+        # Wait for the availability of the new created AMIs, polling them all together
+        wait_for_images_availability(ami_list, AWS_DEFAULT_REGION, "Source")
+        source_wait_end_time = current_time()
+        for ami in ami_list:
+            tracing.record_spans(groups[ami["InstanceId"]], "source_available", ami["CreateEndTime"],
+                                 ami.get("SourceEndTime", source_wait_end_time), Representative=ami["InstanceId"],
+                                 State=ami.get("SourceState", "pending"))
+
+    with prof.profile_phase("copy"):
+        # Estimates the copy time of each Ami from the size of its instance volumes
+        volume_sizes = get_instance_volume_sizes(instance_volumes)
+        for ami in ami_list:
+            ami["ExpectedCopySeconds"] = estimate_copy_seconds(
+                volume_sizes[ami["InstanceId"]], COPY_BASE_SECONDS, COPY_MIB_PER_SECOND)
+
+        # Starts the longest copies first so that small images fill the remaining slots
+        ami_list = order_longest_copies_first(ami_list)
+        predicted_makespan = predict_copy_makespan(ami_list, MAX_CONCURRENT_COPIES)
+        print(f"Predicted copy makespan: {predicted_makespan / 60:.1f} minutes")
+
+        # Copies each Ami to destination region, keeping at most MAX_CONCURRENT_COPIES in flight
+        copy_start_time = current_time()
+        copy_instance_images(ami_list, AWS_DEFAULT_REGION, DESTINATION_REGION, MAX_CONCURRENT_COPIES)
+
+    with prof.profile_phase("discover"):
+        # Now, call the extract_ec2_resource_info function to get additional resource info
+        resource_info = extract_ec2_resource_info(ec2_instance_ids)
+
+    # Adds imageid to the corresponding ec2 instance, sharing each copied Ami with its whole group
+    add_image_id_to_instances(resource_info, expand_group_images(ami_list, groups))
+
+    with prof.profile_phase("format"):
+        # Formats the resources information in a hierarchical format
+        formatted_info = format_ec2_resource_info(resource_info, save_snapshot)
+
+    with prof.profile_phase("wait"):
+        # Waits for every copied AMI to be available or failed, polling them all together
+        wait_start_time = current_time()
+        wait_for_images_availability(ami_list, DESTINATION_REGION, "Copy")
+        wait_end_time = current_time()
+        for ami in ami_list:
+            members = groups[ami["InstanceId"]]
+            # Copies still pending at the deadline are traced up to the end of the wait
+            copy_end_time = ami.get("CopyEndTime", wait_end_time)
+            # The part of a copy still in flight once the resources are formatted is traced as
+            # the wait instead, so that the copy and wait spans of an instance do not overlap
+            tracing.record_spans(members, "copy", ami["CopyStartTime"], min(copy_end_time, wait_start_time),
+                                 Representative=ami["InstanceId"], ImageId=ami["ImageId"],
+                                 State=ami.get("CopyState", "pending"))
+            if copy_end_time > wait_start_time:
+                tracing.record_spans(members, "wait", wait_start_time, copy_end_time,
+                                     Representative=ami["InstanceId"])
+    # The actual makespan ends with the last copy seen finishing, not when this process stopped waiting
+    copy_end_times = [ami["CopyEndTime"] for ami in ami_list if "CopyEndTime" in ami]
+    pending_copies = len(ami_list) - len(copy_end_times)
+    failed_copies = sum(1 for ami in ami_list if ami.get("CopyState") not in (None, "available"))
+    if pending_copies:
+        print(f"Copy makespan: predicted {predicted_makespan / 60:.1f} minutes, "
+              f"actual unknown, {pending_copies} copies still pending")
+    elif copy_end_times:
+        actual_makespan = max(copy_end_times) - copy_start_time
+        print(f"Copy makespan: predicted {predicted_makespan / 60:.1f} minutes, "
+              f"actual {actual_makespan / 60:.1f} minutes")
+    if failed_copies:
+        print(f"{failed_copies} copies failed or ended in an unusable state.")
 
-    :param image_id: str
-        The ID of the AMI.
+    return formatted_info
+
+
+def wait_for_images_availability(ami_list, region, key_prefix, deadline_seconds=None):
+    """
+    Poll AMIs together until none of them is pending or the deadline has passed.
+
+    The AMIs are described in batches every COPY_POLL_SECONDS, so the time each AMI is seen
+    finishing is accurate to the polling interval. AMIs already seen finishing are skipped.
+    Every state other than "pending", such as "failed", "error" or "deregistered", is final.
+
+    :param ami_list: list
+        Dictionaries containing the ImageId of each AMI. The time each AMI was seen finishing
+        and its final state are set under "<key_prefix>EndTime" and "<key_prefix>State".
     :param region: str
-        The AWS region to check in.
+        The AWS region of the AMIs.
+    :param key_prefix: str
+        The prefix of the keys set on each AMI, e.g. "Source" or "Copy".
+    :param deadline_seconds: float
+        How long to wait before giving up on the AMIs still pending, by default
+        IMAGE_WAIT_DEADLINE_SECONDS.
+    :return: list
+        The AMIs still pending at the deadline.
     """
-    try:
-        ec2_client = boto3.client('ec2', region_name=region)
-        max_tries = 40
-        sleep_time = 30
-        print("Copying AMIs to the desired region")
-        for attempt in range(max_tries):
-            response = ec2_client.describe_images(ImageIds=[image_id])
-            if response['Images']:
-                image_state = response['Images'][0]['State']
-                print(
-                    f"Attempt {attempt + 1}: Image {image_id} is in '{image_state}' state.")
-
-                if image_state == 'available':
-                    print(f"Image {image_id} is now available.")
-                    return
-                else:
-                    time.sleep(sleep_time)
-            else:
-                print(f"No image found with ID: {image_id}")
-                return
-
-        print(
-            f"Image {image_id} did not become available after {max_tries} attempts.")
-
-    except ClientError as e:
-        print(f"An error occurred: {e}")
+    if deadline_seconds is None:
+        deadline_seconds = IMAGE_WAIT_DEADLINE_SECONDS
+    end_time_key = f"{key_prefix}EndTime"
+    pending = {ami["ImageId"]: ami for ami in ami_list if end_time_key not in ami}
+    not_found_polls = {}
+    deadline = current_time() + deadline_seconds
+
+    while pending:
+        print(f"Waiting for {len(pending)} image(s) to become available in {region}")
+        image_states = poll_image_states(pending, region, not_found_polls)
+        record_finished_images(pending, image_states, key_prefix)
+
+        if pending:
+            if current_time() >= deadline:
+                print(f"{len(pending)} image(s) still pending in {region} after "
+                      f"{deadline_seconds / 60:.0f} minutes: {', '.join(pending)}")
+                break
+            pause(COPY_POLL_SECONDS)
+
+    return list(pending.values())
@@ -0,0 +1,38 @@
+import argparse
+import get_data_functions as data
+import create_tf_files_functions as tf
+import profiling_functions as prof
+import tracing_functions as tracing
+
+
+def get_migrate_args():
+    parser = argparse.ArgumentParser(
+        description="Migrate EC2 instances in one process: create and copy their AMIs, then create the "
+                    "Terraform files from the discovered resources without going through the audit directory.")
+    data.add_get_data_arguments(parser)
+    tf.add_render_arguments(parser)
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Also save the formatted resources to the audit directory.")
+    prof.add_profiling_arguments(parser)
+    tracing.add_tracing_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = get_migrate_args()
+    if args.profile:
+        prof.enable_profiling(args.profile_dir)
+
+    if args.trace:
+        tracing.enable_tracing(args.trace)
+
+    formatted_info = data.migrate_instance_images(args.instance_ids, args.group_by_tag, args.snapshot)
+
+    # Hands the formatted resources straight to the Terraform rendering
+    tf.render_terraform_files(tf.iter_inventory_vpcs(formatted_info), args.render_mode, args.workers)
+
+    prof.write_profile_report("migrate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import accounts_functions as accounts
+import create_tf_files_functions as tf
+
+
+def get_migrate_accounts_args():
+    parser = argparse.ArgumentParser(
+        description="Migrate EC2 instances of several AWS accounts at once by assuming a role in each of them.")
+    parser.add_argument("accounts", help="JSON file with the accounts, their role ARN and their instance selector.")
+    parser.add_argument("--max-accounts", type=int, default=4,
+                        help="Number of accounts migrated at the same time (default: 4).")
+    tf.add_render_arguments(parser)
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Also save the formatted resources to the audit directory of each account.")
+    return parser.parse_args()
+
+
+def main():
+    args = get_migrate_accounts_args()
+    account_list = accounts.load_accounts(args.accounts)
+
+    # Each account runs in its own process, so its credentials and output directories stay separate
+    with ProcessPoolExecutor(max_workers=args.max_accounts) as executor:
+        futures = {account["AccountId"]: executor.submit(accounts.migrate_account, account,
+                                                         args.render_mode, args.snapshot, args.workers)
+                   for account in account_list}
+
+        failed_accounts = []
+        for account_id, future in futures.items():
+            try:
+                result = future.result()
+                print(f"Account {account_id}: {result['Instances']} instance(s) migrated.")
+            except Exception as e:
+                failed_accounts.append(account_id)
+                print(f"Account {account_id} failed: {e}")
+
+    if failed_accounts:
+        print(f"Failed accounts: {', '.join(failed_accounts)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+profiling_enabled = False
+profile_directory = None
+phase_stats = {}
+phase_profilers = {}
+phase_stack = []
+
+NO_PROFILING = nullcontext()
+
+
+def add_profiling_arguments(parser):
+    """
+    Add the --profile and --profile-dir command-line arguments to a parser.
+
+    :param parser: argparse.ArgumentParser
+        The parser to extend.
+
+    :return: None
+    """
+    parser.add_argument("--profile", action="store_true",
+                        help="Record wall time, CPU time and memory peak of each phase.")
+    parser.add_argument("--profile-dir",
+                        help="With --profile, also write a cProfile file per phase to this directory.")
+
+
+def enable_profiling(output_directory=None):
+    """
+    Start recording the time and memory used by each named phase.
+
+    :param output_directory: str
+        The directory to write one cProfile file per phase to, or None to only
+        record wall time, CPU time and memory peaks.
+
+    :return: None
+    """
+    global profiling_enabled, profile_directory
+    profiling_enabled = True
+    profile_directory = output_directory
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable_profiling():
+    """
+    Stop recording phases and tracing memory allocations.
+
+    Used in worker processes, which inherit the profiling state of their parent when
+    forked but whose statistics are not collected.
+
+    :return: None
+    """
+    global profiling_enabled, profile_directory
+    profiling_enabled = False
+    profile_directory = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def profile_phase(name):
+    """
+    Get a context manager that records the execution of a named phase.
+
+    Phases may be nested. Wall and CPU time are counted in the innermost active
+    phase only, so the times of all phases add up to the profiled run. The memory
+    peak of a phase includes the phases nested in it. When profiling is off the
+    shared no-op context manager is returned.
+
+    :param name: str
+        The name of the phase (e.g. "discover", "copy", "render").
+
+    :return: context manager
+        The context manager wrapping the phase.
+    """
+    if not profiling_enabled:
+        return NO_PROFILING
+    return record_phase(name)
+
+
+@contextmanager
+def record_phase(name):
+    stats = phase_stats.setdefault(name, {"Calls": 0, "WallSeconds": 0.0, "CpuSeconds": 0.0,
+                                          "PeakMemoryBytes": 0})
+    parent = phase_stack[-1] if phase_stack else None
+    profiler = None
+
+    if profile_directory is not None:
+        if name not in phase_profilers:
+            phase_profilers[name] = cProfile.Profile()
+        profiler = phase_profilers[name]
+        # Only one profiler can be active, so the parent phase is paused while this one runs
+        if parent is not None and parent["Profiler"] is not None:
+            parent["Profiler"].disable()
+
+    # Keep the peak reached so far by the parent before restarting the peak for this phase
+    current_memory, peak_memory = tracemalloc.get_traced_memory()
+    if parent is not None:
+        parent["PeakMemory"] = max(parent["PeakMemory"], peak_memory)
+    tracemalloc.reset_peak()
+
+    frame = {"Profiler": profiler, "PeakMemory": 0, "ChildWall": 0.0, "ChildCpu": 0.0}
+    phase_stack.append(frame)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        phase_stack.pop()
+
+        _, peak_memory = tracemalloc.get_traced_memory()
+        peak_memory = max(frame["PeakMemory"], peak_memory)
+
+        stats["Calls"] += 1
+        stats["WallSeconds"] += wall - frame["ChildWall"]
+        stats["CpuSeconds"] += cpu - frame["ChildCpu"]
+        stats["PeakMemoryBytes"] = max(stats["PeakMemoryBytes"], peak_memory - current_memory)
+
+        if parent is not None:
+            parent["ChildWall"] += wall
+            parent["ChildCpu"] += cpu
+            parent["PeakMemory"] = max(parent["PeakMemory"], peak_memory)
+            if parent["Profiler"] is not None:
+                parent["Profiler"].enable()
+
+
+def write_profile_report(entry_point):
+    """
+    Print the recorded phase statistics and write the per-phase profiles.
+
+    With an output directory, the statistics are written to "<entry_point>-phases.json"
+    and the profile of each phase to "<entry_point>-<phase>.prof", readable with pstats.
+
+    :param entry_point: str
+        The name of the profiled entry point (e.g. "get_data").
+
+    :return: None
+    """
+    if not profiling_enabled:
+        return
+
+    print(f"Profile of {entry_point}:")
+    print(f"  {'phase':<10} {'calls':>7} {'wall s':>10} {'cpu s':>10} {'peak MiB':>10}")
+    for name, stats in phase_stats.items():
+        print(f"  {name:<10} {stats['Calls']:>7} {stats['WallSeconds']:>10.3f} "
+              f"{stats['CpuSeconds']:>10.3f} {stats['PeakMemoryBytes'] / 1048576:>10.2f}")
+
+    if profile_directory is None:
+        return
+
+    os.makedirs(profile_directory, exist_ok=True)
+    with open(os.path.join(profile_directory, f"{entry_point}-phases.json"), "w") as file:
+        json.dump(phase_stats, file, indent=4)
+    for name, profiler in phase_profilers.items():
+        profiler.dump_stats(os.path.join(profile_directory, f"{entry_point}-{name}.prof"))
+    print(f"Phase profiles written to {profile_directory}")
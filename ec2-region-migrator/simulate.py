@@ -0,0 +1,144 @@
+import io
+import json
+import argparse
+import tempfile
+import contextlib
+import get_data_functions as data
+import audit_functions as audit
+import simulate_functions as sim
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Predict the timeline of a migration wave by running get_data against a fake EC2 backend in virtual time.")
+    parser.add_argument("inventory", help="JSON file with the instances to simulate.")
+    parser.add_argument("--max-concurrent-copies", type=data.positive_int, default=data.MAX_CONCURRENT_COPIES,
+                        help="Copies get_data keeps in flight (default: MAX_CONCURRENT_COPIES).")
+    parser.add_argument("--region-copy-limit", type=data.positive_int,
+                        default=sim.DEFAULT_SIMULATION_SETTINGS["RegionCopyLimit"],
+                        help="Concurrent copies the destination region accepts.")
+    parser.add_argument("--api-latency", type=float,
+                        default=sim.DEFAULT_SIMULATION_SETTINGS["ApiLatencySeconds"],
+                        help="Seconds each API call takes.")
+    parser.add_argument("--api-rate", type=float,
+                        default=sim.DEFAULT_SIMULATION_SETTINGS["ApiRequestsPerSecond"],
+                        help="Sustained requests per second allowed for each API action.")
+    parser.add_argument("--api-burst", type=int,
+                        default=sim.DEFAULT_SIMULATION_SETTINGS["ApiBurst"],
+                        help="Burst of requests allowed for each API action.")
+    parser.add_argument("--copy-throughput", type=float,
+                        default=sim.DEFAULT_SIMULATION_SETTINGS["CopyMibPerSecond"],
+                        help="MiB per second a single AMI copy moves.")
+    parser.add_argument("--group-by-tag", metavar="TAG_KEY",
+                        help="Simulate get_data --group-by-tag with this tag.")
+    parser.add_argument("--output", help="Write the timeline and summary to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of get_data.")
+    return parser.parse_args()
+
+
+def run_simulation(inventory, settings, max_concurrent_copies, group_by_tag=None, verbose=False):
+    """
+    Run the get_data flow against a fake EC2 backend in virtual time.
+
+    :param inventory: dict
+        The instances to simulate.
+
+    :param settings: dict
+        The backend settings, see DEFAULT_SIMULATION_SETTINGS.
+
+    :param max_concurrent_copies: int
+        The number of copies get_data keeps in flight.
+
+    :param group_by_tag: str
+        The tag grouping identical instances, or None to image every instance.
+
+    :param verbose: bool
+        Whether to show the output of get_data.
+
+    :return: FakeEC2Backend
+        The backend after the run, holding the events and counters.
+    """
+    clock = sim.VirtualClock()
+    backend = sim.FakeEC2Backend(inventory, settings, clock)
+    instance_ids = [instance["InstanceId"] for instance in inventory.get("Instances", [])]
+
+    saved_state = (data.AWS_DEFAULT_REGION, data.DESTINATION_REGION,
+                   data.MAX_CONCURRENT_COPIES, audit.AUDIT_DIRECTORY, audit.current_run_id)
+    data.AWS_DEFAULT_REGION = sim.SOURCE_REGION
+    data.DESTINATION_REGION = sim.DESTINATION_REGION
+    data.MAX_CONCURRENT_COPIES = max_concurrent_copies
+    data.set_ec2_client_factory(
+        lambda region_name: sim.FakeEC2Client(backend, region_name or sim.SOURCE_REGION))
+    data.set_time_functions(clock.sleep, clock.time)
+
+    try:
+        # Keep the audit files of the simulation out of the real audit directory
+        with tempfile.TemporaryDirectory() as audit_directory:
+            audit.AUDIT_DIRECTORY = audit_directory
+            audit.current_run_id = None
+            output = None if verbose else io.StringIO()
+            with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+                try:
+                    data.migrate_instance_images(instance_ids, group_by_tag)
+                except sim.ClientError as e:
+                    # The real run would stop here too, e.g. when the region rejects a copy
+                    backend.error = str(e)
+                    backend.record_event("failed", Error=backend.error)
+    finally:
+        (data.AWS_DEFAULT_REGION, data.DESTINATION_REGION,
+         data.MAX_CONCURRENT_COPIES, audit.AUDIT_DIRECTORY, audit.current_run_id) = saved_state
+        data.set_ec2_client_factory(None)
+        data.set_time_functions(data.time.sleep, data.time.time)
+
+    # A failed run stops before the last copy lands, so the wave ends with whichever is later
+    backend.return_time = clock.time()
+    backend.makespan = max([backend.return_time] + [image["AvailableAt"] for image in backend.images.values()
+                                                     if image["Kind"] == "copy"])
+    return backend
+
+
+def main():
+    args = parse_args()
+    inventory = sim.load_inventory(args.inventory)
+    settings = dict(sim.DEFAULT_SIMULATION_SETTINGS,
+                    ApiLatencySeconds=args.api_latency,
+                    ApiRequestsPerSecond=args.api_rate,
+                    ApiBurst=args.api_burst,
+                    RegionCopyLimit=args.region_copy_limit,
+                    CopyMibPerSecond=args.copy_throughput)
+
+    backend = run_simulation(inventory, settings, args.max_concurrent_copies,
+                             args.group_by_tag, args.verbose)
+    timeline = sim.build_timeline(backend)
+
+    print("Predicted timeline:")
+    for event in timeline:
+        details = " ".join(f"{key}={value}" for key, value in event.items()
+                           if key not in ("Time", "Event", "AvailableAt"))
+        print(f"  {sim.format_duration(event['Time'])}  {event['Event']:<17} {details}")
+
+    summary = {
+        "Instances": len(backend.instances),
+        "MaxConcurrentCopies": args.max_concurrent_copies,
+        "MakespanSeconds": backend.makespan,
+        "GetDataReturnSeconds": backend.return_time,
+        "ApiCalls": backend.api_calls,
+        "ThrottledCalls": backend.throttled_calls,
+        "RejectedCopies": backend.rejected_copies,
+    }
+    if backend.error:
+        summary["Error"] = backend.error
+        print(f"The wave is predicted to fail: {backend.error}")
+    if backend.return_time < backend.makespan:
+        print(f"get_data returns at {sim.format_duration(backend.return_time)}, "
+              f"before the last copy is available.")
+    print(f"Predicted makespan: {sim.format_duration(backend.makespan)} "
+          f"({backend.api_calls} API calls, {backend.throttled_calls} throttled)")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"Settings": settings, "Summary": summary, "Timeline": timeline}, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
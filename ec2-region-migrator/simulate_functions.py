@@ -0,0 +1,296 @@
+import json
+from botocore.exceptions import ClientError
+
+SOURCE_REGION = "source-region"
+DESTINATION_REGION = "destination-region"
+
+DEFAULT_SIMULATION_SETTINGS = {
+    # Seconds each API call takes to return
+    "ApiLatencySeconds": 0.2,
+    # Token bucket of each API action: sustained requests per second and burst size
+    "ApiRequestsPerSecond": 10.0,
+    "ApiBurst": 50,
+    # Maximum number of AMI copies in progress in the destination region
+    "RegionCopyLimit": 50,
+    # Time for create_image to snapshot the volumes of an instance
+    "CreateImageBaseSeconds": 120.0,
+    "CreateImageSecondsPerGib": 1.0,
+    # Time for copy_image to move the snapshots of an image across regions
+    "CopyBaseSeconds": 300.0,
+    "CopyMibPerSecond": 50.0,
+}
+
+
+class VirtualClock:
+    """A clock that only moves when something waits on it."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class FakeEC2Backend:
+    """
+    In-memory EC2 state shared by the fake clients of every region.
+
+    API calls cost latency and are throttled per action with a token bucket; throttled
+    calls wait for a token, as the Boto3 retry handler would. Images become available
+    once their modelled snapshot or copy time has elapsed.
+    """
+
+    def __init__(self, inventory, settings, clock):
+        self.settings = settings
+        self.clock = clock
+        self.instances = {}
+        self.images = {}
+        self.buckets = {}
+        self.events = []
+        self.api_calls = 0
+        self.throttled_calls = 0
+        self.rejected_copies = 0
+        self.image_counter = 0
+        self.error = None
+
+        for instance in inventory.get("Instances", []):
+            self.instances[instance["InstanceId"]] = {
+                "InstanceId": instance["InstanceId"],
+                "InstanceType": instance.get("InstanceType", "t3.micro"),
+                "State": {"Name": instance.get("State", "running")},
+                "ImageId": instance.get("ImageId", "ami-source"),
+                "VpcId": instance.get("VpcId", "vpc-simulated"),
+                "SubnetId": instance.get("SubnetId", "subnet-simulated"),
+                "PrivateIpAddress": instance.get("PrivateIpAddress", "10.0.0.10"),
+                "SecurityGroups": [{"GroupId": group_id}
+                                   for group_id in instance.get("SecurityGroups", ["sg-simulated"])],
+                "Tags": instance.get("Tags", []),
+                "VolumeSizes": instance.get("VolumeSizes", [8]),
+            }
+
+    def record_event(self, event, **details):
+        self.events.append({"Time": self.clock.time(), "Event": event, **details})
+
+    def request(self, action):
+        """Charge one API call of the given action against its throttle and latency."""
+        now = self.clock.time()
+        rate = self.settings["ApiRequestsPerSecond"]
+        burst = self.settings["ApiBurst"]
+        tokens, last_refill = self.buckets.get(action, (burst, now))
+        tokens = min(burst, tokens + (now - last_refill) * rate)
+
+        if tokens < 1:
+            self.throttled_calls += 1
+            self.record_event("throttled", Action=action)
+            self.clock.sleep((1 - tokens) / rate)
+            tokens = 1
+
+        self.buckets[action] = (tokens - 1, self.clock.time())
+        self.api_calls += 1
+        self.clock.sleep(self.settings["ApiLatencySeconds"])
+
+    def image_state(self, image):
+        return "available" if self.clock.time() >= image["AvailableAt"] else "pending"
+
+    def copies_in_progress(self, region):
+        return sum(1 for image in self.images.values()
+                   if image["Region"] == region and image["Kind"] == "copy"
+                   and self.image_state(image) == "pending")
+
+    def new_image_id(self):
+        self.image_counter += 1
+        return f"ami-{self.image_counter:017x}"
+
+    def get_instance(self, instance_id):
+        if instance_id not in self.instances:
+            raise ClientError({"Error": {"Code": "InvalidInstanceID.NotFound",
+                                         "Message": f"The instance ID '{instance_id}' does not exist"}},
+                              "DescribeInstances")
+        return self.instances[instance_id]
+
+    def get_image(self, image_id, region):
+        image = self.images.get(image_id)
+        if image is None or image["Region"] != region:
+            raise ClientError({"Error": {"Code": "InvalidAMIID.NotFound",
+                                         "Message": f"The image id '[{image_id}]' does not exist"}},
+                              "DescribeImages")
+        return image
+
+
+class FakeEC2Client:
+    """The subset of the Boto3 EC2 client used by get_data_functions, served by a FakeEC2Backend."""
+
+    def __init__(self, backend, region):
+        self.backend = backend
+        self.region = region
+
+    def describe_instances(self, InstanceIds=None, Filters=None, NextToken=None):
+        self.backend.request("DescribeInstances")
+        if InstanceIds is not None:
+            selected = [self.backend.get_instance(instance_id) for instance_id in InstanceIds]
+        else:
+            selected = list(self.backend.instances.values())
+
+        # Only the instance-id, instance-state-name and tag:<Key> filters are modelled
+        for instance_filter in Filters or []:
+            name, values = instance_filter["Name"], instance_filter["Values"]
+            if name == "instance-state-name":
+                selected = [instance for instance in selected if instance["State"]["Name"] in values]
+            elif name == "instance-id":
+                selected = [instance for instance in selected if instance["InstanceId"] in values]
+            elif name.startswith("tag:"):
+                tag_key = name[len("tag:"):]
+                selected = [instance for instance in selected
+                            if any(tag["Key"] == tag_key and tag["Value"] in values for tag in instance["Tags"])]
+
+        instances = [{key: value for key, value in instance.items() if key != "VolumeSizes"}
+                     for instance in selected]
+        return {"Reservations": [{"Instances": instances}]}
+
+    def describe_vpcs(self, VpcIds):
+        self.backend.request("DescribeVpcs")
+        return {"Vpcs": [{"VpcId": vpc_id, "CidrBlock": "10.0.0.0/16", "Tags": []} for vpc_id in VpcIds]}
+
+    def describe_subnets(self, SubnetIds):
+        self.backend.request("DescribeSubnets")
+        subnets = []
+        for subnet_id in SubnetIds:
+            vpc_id = next((instance["VpcId"] for instance in self.backend.instances.values()
+                           if instance["SubnetId"] == subnet_id), "vpc-simulated")
+            subnets.append({"SubnetId": subnet_id, "VpcId": vpc_id, "AvailabilityZone": f"{self.region}a",
+                            "CidrBlock": "10.0.1.0/24", "Tags": []})
+        return {"Subnets": subnets}
+
+    def describe_security_groups(self, GroupIds):
+        self.backend.request("DescribeSecurityGroups")
+        vpc_ids = {group["GroupId"]: instance["VpcId"] for instance in self.backend.instances.values()
+                   for group in instance["SecurityGroups"]}
+        return {"SecurityGroups": [{
+            "GroupId": group_id,
+            "VpcId": vpc_ids.get(group_id, "vpc-simulated"),
+            "IpPermissions": [{"FromPort": 22, "ToPort": 22, "IpProtocol": "tcp",
+                               "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}],
+            "IpPermissionsEgress": [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}],
+            "Tags": []
+        } for group_id in GroupIds]}
+
+    def describe_volumes(self, Filters, NextToken=None):
+        self.backend.request("DescribeVolumes")
+        instance_ids = next(value for value in Filters if value["Name"] == "attachment.instance-id")["Values"]
+        volumes = []
+        for instance_id in instance_ids:
+            instance = self.backend.instances.get(instance_id)
+            if instance is None:
+                continue
+            for volume_index, size_gib in enumerate(instance["VolumeSizes"]):
+                volumes.append({"VolumeId": f"vol-{instance_id}-{volume_index}", "Size": size_gib,
+                                "VolumeType": "gp3",
+                                "Attachments": [{"InstanceId": instance_id,
+                                                 "Device": f"/dev/sd{chr(ord('a') + volume_index)}"}]})
+        return {"Volumes": volumes}
+
+    def create_image(self, InstanceId, Name):
+        backend = self.backend
+        settings = backend.settings
+        backend.request("CreateImage")
+        instance = backend.get_instance(InstanceId)
+        size_gib = sum(instance["VolumeSizes"])
+        image_id = backend.new_image_id()
+        backend.images[image_id] = {
+            "Region": self.region,
+            "Kind": "create",
+            "InstanceId": InstanceId,
+            "SizeGib": size_gib,
+            "AvailableAt": backend.clock.time() + settings["CreateImageBaseSeconds"]
+            + size_gib * settings["CreateImageSecondsPerGib"],
+        }
+        backend.record_event("create_image", InstanceId=InstanceId, ImageId=image_id, SizeGib=size_gib)
+        return {"ImageId": image_id}
+
+    def copy_image(self, Description, Name, SourceImageId, SourceRegion):
+        backend = self.backend
+        settings = backend.settings
+        backend.request("CopyImage")
+        source_image = backend.get_image(SourceImageId, SourceRegion)
+
+        if backend.copies_in_progress(self.region) >= settings["RegionCopyLimit"]:
+            backend.rejected_copies += 1
+            backend.record_event("copy_rejected", InstanceId=source_image["InstanceId"], ImageId=SourceImageId)
+            raise ClientError({"Error": {"Code": "ResourceLimitExceeded",
+                                         "Message": "You have reached the limit of concurrent AMI copies"}},
+                              "CopyImage")
+
+        # The copy cannot start moving data before the source snapshots are complete
+        start = max(backend.clock.time(), source_image["AvailableAt"])
+        duration = settings["CopyBaseSeconds"] + source_image["SizeGib"] * 1024 / settings["CopyMibPerSecond"]
+        image_id = backend.new_image_id()
+        backend.images[image_id] = {
+            "Region": self.region,
+            "Kind": "copy",
+            "InstanceId": source_image["InstanceId"],
+            "SizeGib": source_image["SizeGib"],
+            "AvailableAt": start + duration,
+        }
+        backend.record_event("copy_image", InstanceId=source_image["InstanceId"], ImageId=image_id,
+                             SizeGib=source_image["SizeGib"], AvailableAt=start + duration)
+        return {"ImageId": image_id}
+
+    def describe_images(self, ImageIds):
+        backend = self.backend
+        backend.request("DescribeImages")
+        images = []
+        for image_id in ImageIds:
+            image = backend.get_image(image_id, self.region)
+            images.append({"ImageId": image_id, "State": backend.image_state(image)})
+        return {"Images": images}
+
+
+def load_inventory(file_location):
+    """
+    Read the inventory of instances to simulate.
+
+    :param file_location: str
+        The path to a JSON file with an "Instances" list. Each instance has an InstanceId and
+        optionally VolumeSizes (GiB), InstanceType, State, ImageId, VpcId, SubnetId, SecurityGroups and Tags.
+
+    :return: dict
+        The inventory.
+    """
+    with open(file_location, "r") as file:
+        return json.load(file)
+
+
+def build_timeline(backend):
+    """
+    Build the ordered timeline of a simulation, including when each image became available.
+
+    :param backend: FakeEC2Backend
+        The backend the simulation ran against.
+
+    :return: list of dict
+        The timeline events sorted by time.
+    """
+    timeline = list(backend.events)
+    for image_id, image in backend.images.items():
+        event = "source_available" if image["Kind"] == "create" else "copy_available"
+        timeline.append({"Time": image["AvailableAt"], "Event": event,
+                         "InstanceId": image["InstanceId"], "ImageId": image_id})
+    return sorted(timeline, key=lambda event: event["Time"])
+
+
+def format_duration(seconds):
+    """
+    Format a number of seconds as hours, minutes and seconds.
+
+    :param seconds: float
+        The duration in seconds.
+
+    :return: str
+        The formatted duration, e.g. "1:02:03".
+    """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
@@ -101,6 +101,27 @@ provider "aws" {
 }
 """
 
+versions_assume_role_template = """
+# Terraform Block
+terraform {
+  required_version = ">= 1.0"
+  required_providers {
+    aws = {
+      source = "hashicorp/aws"
+      version = ">= 4.65"
+    }
+  }
+}
+
+# Provider Block
+provider "aws" {
+  region = var.aws_region
+  assume_role {
+    role_arn = "%(RoleArn)s"
+  }
+}
+"""
+
 security_group_resource_template = """
 resource "aws_security_group" "security_group_%(index)s" {
   description = %(Description)s
@@ -171,3 +192,46 @@ terraform {
   }
 }
 """
+
+ec2_instances_for_each_template = """
+module "ec2_instances" {
+  source  = "terraform-aws-modules/ec2-instance/aws"
+  version = "5.5.0"
+
+  for_each = var.ec2_instances
+
+  name          = each.key
+  ami           = each.value.ami
+  instance_type = each.value.instance_type
+
+  subnet_id              = module.vpc.public_subnets[each.value.subnet_index]
+  vpc_security_group_ids = []
+
+  tags = each.value.tags
+}
+"""
+
+ec2_instances_variables_template = """
+# EC2 Instances, keyed by instance name
+variable "ec2_instances" {
+  description = "EC2 Instances"
+  type = map(object({
+    ami           = string
+    instance_type = string
+    subnet_index  = number
+    tags          = map(string)
+  }))
+  default = {}
+}
+"""
+
+eip_for_each_template = """
+# Create an Elastic IP for each Instance
+resource "aws_eip" "instance_eip" {
+  for_each = module.ec2_instances
+
+  instance   = each.value.id
+  domain     = "vpc"
+  depends_on = [module.ec2_instances, module.vpc]
+}
+"""
@@ -0,0 +1,39 @@
+import os
+import io
+import sys
+import contextlib
+import pytest
+
+# The migrator modules are scripts importing each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def formatted_inventory(tmp_path, monkeypatch):
+    """The formatted resources of a few instances spread over three VPCs, discovered from the fake backend."""
+    import get_data_functions as data
+    import audit_functions as audit
+    import simulate_functions as sim
+
+    inventory = {"Instances": [
+        {"InstanceId": f"i-{index:04d}", "VolumeSizes": [8, 10 * index],
+         "VpcId": f"vpc-{index % 3}", "SubnetId": f"subnet-{index % 3}-{index % 2}",
+         "SecurityGroups": [f"sg-{index % 4}", "sg-common"],
+         "Tags": [{"Key": "Name", "Value": f"web-{index}"}]}
+        for index in range(8)]}
+    clock = sim.VirtualClock()
+    backend = sim.FakeEC2Backend(inventory, dict(sim.DEFAULT_SIMULATION_SETTINGS), clock)
+
+    monkeypatch.setattr(data, "AWS_DEFAULT_REGION", sim.SOURCE_REGION)
+    monkeypatch.setattr(data, "DESTINATION_REGION", sim.DESTINATION_REGION)
+    monkeypatch.setattr(audit, "AUDIT_DIRECTORY", str(tmp_path / "audit"))
+    monkeypatch.setattr(audit, "current_run_id", None)
+    data.set_ec2_client_factory(lambda region_name: sim.FakeEC2Client(backend, region_name or sim.SOURCE_REGION))
+    data.set_time_functions(clock.sleep, clock.time)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield data.migrate_instance_images([instance["InstanceId"] for instance in inventory["Instances"]],
+                                               save_snapshot=False)
+    finally:
+        data.set_ec2_client_factory(None)
+        data.set_time_functions(data.time.sleep, data.time.time)
@@ -0,0 +1,40 @@
+import pytest
+import get_data_functions as data
+import accounts_functions as accounts
+import simulate_functions as sim
+
+INVENTORY = {"Instances": [
+    {"InstanceId": "i-running", "Tags": [{"Key": "Wave", "Value": "1"}]},
+    {"InstanceId": "i-stopped", "State": "stopped", "Tags": [{"Key": "Wave", "Value": "1"}]},
+    {"InstanceId": "i-terminated", "State": "terminated", "Tags": [{"Key": "Wave", "Value": "1"}]},
+    {"InstanceId": "i-shutting-down", "State": "shutting-down", "Tags": [{"Key": "Wave", "Value": "1"}]},
+    {"InstanceId": "i-other-wave", "Tags": [{"Key": "Wave", "Value": "2"}]},
+]}
+
+
+@pytest.fixture(autouse=True)
+def fake_ec2():
+    backend = sim.FakeEC2Backend(INVENTORY, dict(sim.DEFAULT_SIMULATION_SETTINGS), sim.VirtualClock())
+    data.set_ec2_client_factory(lambda region_name: sim.FakeEC2Client(backend, region_name))
+    yield
+    data.set_ec2_client_factory(None)
+
+
+def test_filters_only_select_instances_that_can_be_imaged():
+    account = {"AccountId": "111111111111", "Filters": [{"Name": "tag:Wave", "Values": ["1"]}]}
+
+    assert accounts.select_instance_ids(account) == ["i-running", "i-stopped"]
+    assert account["Filters"] == [{"Name": "tag:Wave", "Values": ["1"]}]
+
+
+def test_filters_selecting_states_are_kept():
+    account = {"AccountId": "111111111111", "Filters": [{"Name": "tag:Wave", "Values": ["1"]},
+                                                        {"Name": "instance-state-name", "Values": ["stopped"]}]}
+
+    assert accounts.select_instance_ids(account) == ["i-stopped"]
+
+
+def test_instance_ids_are_used_as_given():
+    account = {"AccountId": "111111111111", "InstanceIds": ["i-running", "i-other-wave"]}
+
+    assert accounts.select_instance_ids(account) == ["i-running", "i-other-wave"]
@@ -0,0 +1,82 @@
+import os
+import json
+import pytest
+import audit_functions as audit
+
+
+@pytest.fixture(autouse=True)
+def audit_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(audit, "current_run_id", None)
+    return tmp_path
+
+
+def save_file(audit_directory, resource_type, file_name, data):
+    file_path = os.path.join(str(audit_directory), file_name)
+    with open(file_path, "w") as file:
+        json.dump(data, file)
+    audit.record_audit_file("", resource_type, file_path)
+    return file_path
+
+
+def test_latest_formatted_file_follows_the_last_snapshot(audit_directory):
+    audit.start_audit_run()
+    first_snapshot = save_file(audit_directory, "formatted", "formatted__1.json", {})
+    audit.start_audit_run()
+    second_snapshot = save_file(audit_directory, "formatted", "formatted__2.json", {})
+
+    assert first_snapshot != second_snapshot
+    assert audit.get_latest_formatted_file() == second_snapshot
+
+
+def test_run_without_snapshot_keeps_the_previous_snapshot(audit_directory):
+    audit.start_audit_run()
+    snapshot = save_file(audit_directory, "formatted", "formatted__1.json", {})
+    audit.start_audit_run()
+    save_file(audit_directory, "ami", "ami_ami-1_2.json", {})
+
+    assert audit.get_latest_formatted_file() == snapshot
+
+
+def test_compaction_keeps_the_run_of_the_latest_snapshot(audit_directory):
+    audit.start_audit_run()
+    snapshot = save_file(audit_directory, "formatted", "formatted__1.json", {})
+    audit.start_audit_run()
+    save_file(audit_directory, "ami", "ami_ami-1_2.json", {})
+
+    audit.compact_audit_runs(1)
+
+    assert audit.get_latest_formatted_file() == snapshot
+    assert os.path.exists(snapshot)
+
+
+def test_latest_run_without_snapshot_is_not_replaced_by_an_older_file(audit_directory):
+    save_file(audit_directory, "formatted", "formatted__1.json", {})
+    audit.write_latest_run({"RunId": "run", "Formatted": None})
+
+    assert audit.get_latest_formatted_file() is None
+
+
+def test_legacy_directory_uses_the_newest_formatted_file(audit_directory):
+    for file_name in ["formatted__2024-01-01.json", "formatted__2024-02-01.json", "vpc_vpc-1_2024-03-01.json"]:
+        (audit_directory / file_name).write_text("{}")
+
+    assert audit.get_latest_formatted_file() == str(audit_directory / "formatted__2024-02-01.json")
+
+
+def test_account_runs_are_compacted_per_account(audit_directory, monkeypatch):
+    for account_id in ["111111111111", "222222222222"]:
+        monkeypatch.setattr(audit, "AUDIT_DIRECTORY", str(audit_directory / account_id))
+        for run in range(3):
+            audit.start_audit_run()
+            save_file(audit_directory / account_id, "formatted", f"formatted__{run}.json", {})
+    monkeypatch.setattr(audit, "AUDIT_DIRECTORY", str(audit_directory))
+
+    assert audit.list_account_audit_directories() == ["111111111111", "222222222222"]
+    archives = audit.compact_account_audit_runs(1, ["222222222222"])
+
+    assert len(archives) == 2
+    assert audit.AUDIT_DIRECTORY == str(audit_directory)
+    assert len(os.listdir(audit_directory / "111111111111" / "runs")) == 3
+    assert len(os.listdir(audit_directory / "222222222222" / "runs")) == 1
+    assert len(audit.compact_account_audit_runs(1)) == 2
@@ -0,0 +1,72 @@
+import argparse
+import pytest
+from botocore.exceptions import ClientError
+import get_data_functions as data
+import audit_functions as audit
+import simulate_functions as sim
+
+
+class FakeCopyClient:
+    """Starts copies and serves their states; each copy is invisible for its first poll interval."""
+
+    def __init__(self, clock, final_states):
+        self.clock = clock
+        self.final_states = final_states
+        self.copies = {}
+
+    def copy_image(self, Description, Name, SourceImageId, SourceRegion):
+        image_id = f"ami-copy-{SourceImageId}"
+        self.copies[image_id] = self.clock.time()
+        return {"ImageId": image_id}
+
+    def describe_images(self, ImageIds):
+        images = []
+        for image_id in ImageIds:
+            age = self.clock.time() - self.copies[image_id]
+            if age < data.COPY_POLL_SECONDS:
+                raise ClientError({"Error": {"Code": "InvalidAMIID.NotFound", "Message": image_id}},
+                                  "DescribeImages")
+            state = self.final_states[image_id] if age >= 2 * data.COPY_POLL_SECONDS else "pending"
+            images.append({"ImageId": image_id, "State": state})
+        return {"Images": images}
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(audit, "current_run_id", None)
+    clock = sim.VirtualClock()
+    data.set_time_functions(clock.sleep, clock.time)
+    yield clock
+    data.set_ec2_client_factory(None)
+    data.set_time_functions(data.time.sleep, data.time.time)
+
+
+def test_copies_not_visible_yet_or_in_error_free_their_slot(clock):
+    client = FakeCopyClient(clock, {"ami-copy-ami-1": "error", "ami-copy-ami-2": "available",
+                                    "ami-copy-ami-3": "available"})
+    data.set_ec2_client_factory(lambda region_name: client)
+    ami_list = [{"ImageId": f"ami-{index}", "InstanceId": f"i-{index}"} for index in range(1, 4)]
+
+    data.copy_instance_images(ami_list, "source", "destination", 1)
+
+    assert [ami["ImageId"] for ami in ami_list] == ["ami-copy-ami-1", "ami-copy-ami-2", "ami-copy-ami-3"]
+    assert ami_list[0]["CopyState"] == "error"
+    assert ami_list[1]["CopyState"] == "available"
+    assert "CopyEndTime" not in ami_list[2]
+    assert ami_list[1]["CopyStartTime"] == ami_list[0]["CopyEndTime"]
+
+
+def test_copy_limit_below_one_is_rejected(clock):
+    with pytest.raises(ValueError):
+        data.copy_instance_images([{"ImageId": "ami-1", "InstanceId": "i-1"}], "source", "destination", 0)
+
+
+@pytest.mark.parametrize("value", ["0", "-3", "two"])
+def test_positive_int_rejects_values_below_one(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        data.positive_int(value)
+
+
+def test_positive_int_parses_whole_numbers():
+    assert data.positive_int("50") == 50
@@ -0,0 +1,95 @@
+import pytest
+from botocore.exceptions import ClientError
+import get_data_functions as data
+import simulate_functions as sim
+
+
+class FakeImagesClient:
+    """Serves DescribeImages from a list of states per image, one entry per poll interval."""
+
+    def __init__(self, clock, image_states):
+        self.clock = clock
+        self.image_states = image_states
+
+    def describe_images(self, ImageIds):
+        images = []
+        for image_id in ImageIds:
+            states = self.image_states[image_id]
+            poll = int(self.clock.time() // data.COPY_POLL_SECONDS)
+            state = states[min(poll, len(states) - 1)]
+            if state is None:
+                raise ClientError({"Error": {"Code": "InvalidAMIID.NotFound",
+                                             "Message": f"The image id '[{image_id}]' does not exist"}},
+                                  "DescribeImages")
+            images.append({"ImageId": image_id, "State": state})
+        return {"Images": images}
+
+
+@pytest.fixture
+def clock():
+    clock = sim.VirtualClock()
+    data.set_time_functions(clock.sleep, clock.time)
+    yield clock
+    data.set_ec2_client_factory(None)
+    data.set_time_functions(data.time.sleep, data.time.time)
+
+
+def use_client(client):
+    data.set_ec2_client_factory(lambda region_name: client)
+
+
+@pytest.mark.parametrize("final_state", ["failed", "error", "invalid", "deregistered", "disabled"])
+def test_every_state_but_pending_is_final(clock, final_state):
+    use_client(FakeImagesClient(clock, {"ami-1": ["pending", final_state]}))
+    ami_list = [{"ImageId": "ami-1"}]
+
+    still_pending = data.wait_for_images_availability(ami_list, "region", "Copy")
+
+    assert still_pending == []
+    assert ami_list[0]["CopyState"] == final_state
+    assert ami_list[0]["CopyEndTime"] == data.COPY_POLL_SECONDS
+
+
+def test_missing_image_does_not_hold_up_the_others(clock):
+    use_client(FakeImagesClient(clock, {"ami-1": [None], "ami-2": ["pending", "available"]}))
+    ami_list = [{"ImageId": "ami-1"}, {"ImageId": "ami-2"}]
+
+    still_pending = data.wait_for_images_availability(ami_list, "region", "Copy")
+
+    assert still_pending == []
+    assert ami_list[0]["CopyState"] == "not-found"
+    assert ami_list[0]["CopyEndTime"] == data.IMAGE_NOT_FOUND_RETRIES * data.COPY_POLL_SECONDS
+    assert ami_list[1]["CopyState"] == "available"
+    assert ami_list[1]["CopyEndTime"] == data.COPY_POLL_SECONDS
+
+
+def test_image_not_visible_yet_is_polled_again(clock):
+    use_client(FakeImagesClient(clock, {"ami-1": [None, None, "available"]}))
+    ami_list = [{"ImageId": "ami-1"}]
+
+    data.wait_for_images_availability(ami_list, "region", "Source")
+
+    assert ami_list[0]["SourceState"] == "available"
+    assert ami_list[0]["SourceEndTime"] == 2 * data.COPY_POLL_SECONDS
+
+
+def test_images_pending_at_the_deadline_are_returned(clock):
+    use_client(FakeImagesClient(clock, {"ami-1": ["pending"], "ami-2": ["pending", "available"]}))
+    ami_list = [{"ImageId": "ami-1"}, {"ImageId": "ami-2"}]
+
+    still_pending = data.wait_for_images_availability(ami_list, "region", "Copy", deadline_seconds=300)
+
+    assert still_pending == [ami_list[0]]
+    assert "CopyEndTime" not in ami_list[0]
+    assert clock.time() == 300
+
+
+def test_other_errors_are_raised(clock):
+    class DeniedClient:
+        def describe_images(self, ImageIds):
+            raise ClientError({"Error": {"Code": "UnauthorizedOperation", "Message": "denied"}}, "DescribeImages")
+
+    use_client(DeniedClient())
+
+    with pytest.raises(ClientError):
+        data.wait_for_images_availability([{"ImageId": "ami-1"}], "region", "Copy")
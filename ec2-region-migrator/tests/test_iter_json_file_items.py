@@ -0,0 +1,70 @@
+import json
+import pytest
+import create_tf_files_functions as tf
+
+DOCUMENT = {
+    "SchemaVersion": 2,
+    "vpc-1": {"CidrBlock": "10.0.0.0/16", "Tags": [{"Key": "Name", "Value": "a \"quoted\" {brace}"}],
+              "Subnets": {"subnet-1": {"EC2Instances": {}}}},
+    "negative": -25000000000.0,
+    "fraction": 0.125,
+    "exponent": 1.5e-7,
+    "upper_exponent": 2E+30,
+    "integer": 1234567890,
+    "flags": [True, False, None],
+    "unicode": "région",
+    "empty": {},
+}
+
+
+def write_json(tmp_path, text):
+    file_path = tmp_path / "formatted.json"
+    file_path.write_text(text)
+    return str(file_path)
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 24))
+def test_yields_top_level_items_in_order(tmp_path, chunk_size):
+    file_location = write_json(tmp_path, json.dumps(DOCUMENT, indent=4))
+
+    items = list(tf.iter_json_file_items(file_location, chunk_size))
+
+    assert items == list(DOCUMENT.items())
+
+
+@pytest.mark.parametrize("text", ["-25000000000.0", "1.5e-7", "2E+30", "0.125", "-1e5", "10"])
+def test_numbers_split_at_any_chunk_boundary_keep_their_value(tmp_path, text):
+    file_location = write_json(tmp_path, '{"value": ' + text + ', "next": 1}')
+
+    for chunk_size in range(1, len(text) + 12):
+        items = dict(tf.iter_json_file_items(file_location, chunk_size))
+        assert items == {"value": json.loads(text), "next": 1}
+        assert type(items["value"]) is type(json.loads(text))
+
+
+def test_empty_object_yields_nothing(tmp_path):
+    file_location = write_json(tmp_path, " { } ")
+
+    assert list(tf.iter_json_file_items(file_location)) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_truncated_file_raises(tmp_path, chunk_size):
+    text = json.dumps(DOCUMENT)
+    for length in range(len(text)):
+        file_location = write_json(tmp_path, text[:length])
+        with pytest.raises(json.JSONDecodeError):
+            list(tf.iter_json_file_items(file_location, chunk_size))
+
+
+@pytest.mark.parametrize("text", ['[1, 2]', '{"a" 1}', '{"a": 1 "b": 2}', '{"a": tru}'])
+def test_malformed_file_raises(tmp_path, text):
+    file_location = write_json(tmp_path, text)
+
+    with pytest.raises(json.JSONDecodeError):
+        list(tf.iter_json_file_items(file_location))
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(tf.iter_json_file_items(str(tmp_path / "missing.json")))
@@ -0,0 +1,80 @@
+import os
+import json
+import io
+import contextlib
+import pytest
+import create_tf_files_functions as tf
+
+
+@pytest.fixture(autouse=True)
+def terraform_environment(monkeypatch):
+    monkeypatch.setenv("DESTINATION_REGION", "destination-region")
+    monkeypatch.setenv("BUCKET_NAME", "state-bucket")
+    monkeypatch.setenv("KEY", "migration.tfstate")
+    monkeypatch.setenv("DYNAMODB_TABLE", "state-lock")
+    monkeypatch.delenv("ASSUME_ROLE_ARN", raising=False)
+
+
+def render_tree(monkeypatch, terraform_directory, vpc_items, render_mode, workers):
+    """Render the VPCs into a directory and return its files as {relative path: content}."""
+    monkeypatch.setattr(tf, "TERRAFORM_DIRECTORY", str(terraform_directory))
+    with contextlib.redirect_stdout(io.StringIO()):
+        tf.render_terraform_files(vpc_items, render_mode, workers)
+
+    tree = {}
+    for directory, _, file_names in os.walk(terraform_directory):
+        for file_name in file_names:
+            file_path = os.path.join(directory, file_name)
+            with open(file_path, "r") as file:
+                tree[os.path.relpath(file_path, terraform_directory)] = file.read()
+    return tree
+
+
+@pytest.mark.parametrize("render_mode", tf.RENDER_MODES)
+def test_parallel_rendering_matches_serial_rendering(tmp_path, monkeypatch, formatted_inventory, render_mode):
+    vpc_items = list(tf.iter_inventory_vpcs(formatted_inventory))
+
+    serial = render_tree(monkeypatch, tmp_path / "serial", iter(vpc_items), render_mode, 1)
+    parallel = render_tree(monkeypatch, tmp_path / "parallel", iter(vpc_items), render_mode, 2)
+
+    assert {os.path.dirname(path) for path in serial} == {"vpc-1", "vpc-2", "vpc-3"}
+    assert parallel == serial
+
+
+def to_version_1_snapshot(formatted_inventory):
+    """Rewrite a formatted inventory the way get_data wrote it before the SchemaVersion key existed."""
+    snapshot = {}
+    for vpc_id, vpc_data in formatted_inventory.items():
+        if vpc_id == "SchemaVersion":
+            continue
+        vpc_info = {key: value for key, value in vpc_data.items() if key != "SecurityGroups"}
+        vpc_info["Subnets"] = {}
+        for subnet_id, subnet_data in vpc_data["Subnets"].items():
+            subnet_info = dict(subnet_data, EC2Instances={})
+            for instance_id, instance_data in subnet_data["EC2Instances"].items():
+                subnet_info["EC2Instances"][instance_id] = {
+                    "InstanceType": instance_data["InstanceType"],
+                    "PrivateIpAddress": instance_data["PrivateIpAddress"],
+                    "Tags": instance_data["Tags"],
+                    "SecurityGroupsDetails": [vpc_data["SecurityGroups"][sg_id]
+                                              for sg_id in instance_data["SecurityGroupIds"]],
+                    "ImageId": instance_data["ImageId"],
+                }
+            vpc_info["Subnets"][subnet_id] = subnet_info
+        snapshot[vpc_id] = vpc_info
+    return snapshot
+
+
+@pytest.mark.parametrize("render_mode", tf.RENDER_MODES)
+def test_version_1_snapshot_renders_like_version_2(tmp_path, monkeypatch, formatted_inventory, render_mode):
+    version_2_file = tmp_path / "formatted_v2.json"
+    version_2_file.write_text(json.dumps(formatted_inventory, indent=4))
+    version_1_file = tmp_path / "formatted_v1.json"
+    version_1_file.write_text(json.dumps(to_version_1_snapshot(formatted_inventory), indent=4))
+    assert "SecurityGroupsDetails" in version_1_file.read_text()
+
+    version_2 = render_tree(monkeypatch, tmp_path / "v2", tf.iter_formatted_vpcs(str(version_2_file)), render_mode, 1)
+    version_1 = render_tree(monkeypatch, tmp_path / "v1", tf.iter_formatted_vpcs(str(version_1_file)), render_mode, 1)
+
+    assert "vpc-1/security-groups.tf" in version_2
+    assert version_1 == version_2
@@ -0,0 +1,40 @@
+import pytest
+import simulate
+import simulate_functions as sim
+import tracing_functions as tracing
+
+INVENTORY = {"Instances": [
+    {"InstanceId": "i-small", "VolumeSizes": [8]},
+    {"InstanceId": "i-big", "VolumeSizes": [500]},
+    {"InstanceId": "i-twin-1", "VolumeSizes": [8], "Tags": [{"Key": "Role", "Value": "web"}]},
+    {"InstanceId": "i-twin-2", "VolumeSizes": [8], "Tags": [{"Key": "Role", "Value": "web"}]},
+]}
+
+
+@pytest.fixture
+def spans(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "trace_file", str(tmp_path / "trace.jsonl"))
+    simulate.run_simulation(INVENTORY, dict(sim.DEFAULT_SIMULATION_SETTINGS), 2, group_by_tag="Role")
+    return tracing.expand_vpc_spans(tracing.load_spans(str(tmp_path / "trace.jsonl")))
+
+
+def test_phases_add_up_to_the_worked_time(spans):
+    summaries = tracing.summarize_instances(spans)
+
+    assert {summary["SpanId"] for summary in summaries} == {"i-small", "i-big", "i-twin-1", "i-twin-2"}
+    for summary in summaries:
+        assert sum(summary["Phases"].values()) == pytest.approx(summary["WorkedSeconds"])
+
+
+def test_the_largest_copy_is_the_critical_path(spans):
+    critical = tracing.find_critical_instances(tracing.summarize_instances(spans))
+
+    assert [summary["SpanId"] for summary in critical] == ["i-big"]
+
+
+def test_group_members_share_the_spans_of_their_representative(spans):
+    phases = {}
+    for span in spans:
+        phases.setdefault(span["SpanId"], []).append((span["Phase"], span["Start"], span["End"]))
+
+    assert phases["i-twin-1"] == phases["i-twin-2"]
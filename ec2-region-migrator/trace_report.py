@@ -0,0 +1,65 @@
+import json
+import argparse
+import tracing_functions as tracing
+
+
+def get_trace_report_args():
+    parser = argparse.ArgumentParser(
+        description="Record spans in a migration trace file and report its critical path.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Append one span, e.g. a terraform apply, to a trace file.")
+    record_parser.add_argument("trace", help="The JSON Lines trace file.")
+    record_parser.add_argument("span_id", help="The instance ID, or the VPC directory name for a whole VPC.")
+    record_parser.add_argument("phase", help="The name of the phase, e.g. apply.")
+    record_parser.add_argument("start", type=float, help="The start time in seconds since the epoch.")
+    record_parser.add_argument("end", type=float, help="The end time in seconds since the epoch.")
+
+    report_parser = subparsers.add_parser("report", help="Print the critical path and queue times of a trace.")
+    report_parser.add_argument("trace", help="The JSON Lines trace file.")
+    report_parser.add_argument("--top", type=int, default=10,
+                               help="Number of last finishing instances to list (default: 10).")
+    report_parser.add_argument("--chrome", metavar="OUTPUT_FILE",
+                               help="Also write the trace in Chrome trace format to this file.")
+    return parser.parse_args()
+
+
+def print_report(summaries, top):
+    if not summaries:
+        print("The trace holds no spans.")
+        return
+
+    wave_start = min(summary["Start"] for summary in summaries)
+    wave_end = max(summary["End"] for summary in summaries)
+    critical_ids = {summary["SpanId"] for summary in tracing.find_critical_instances(summaries)}
+
+    print(f"Wave duration: {wave_end - wave_start:.1f} s over {len(summaries)} instance(s)")
+    print(f"Critical path: {', '.join(sorted(critical_ids))}")
+    print()
+    print(f"  {'instance':<22} {'end s':>10} {'worked s':>10} {'queued s':>10}  phases")
+    for summary in summaries[:top]:
+        marker = "*" if summary["SpanId"] in critical_ids else " "
+        phases = ", ".join(f"{phase} {seconds:.1f}" for phase, seconds in summary["Phases"].items())
+        print(f"{marker} {summary['SpanId']:<22} {summary['End'] - wave_start:>10.1f} "
+              f"{summary['WorkedSeconds']:>10.1f} {summary['QueuedSeconds']:>10.1f}  {phases}")
+
+
+def main():
+    args = get_trace_report_args()
+
+    if args.command == "record":
+        tracing.enable_tracing(args.trace)
+        tracing.record_span(args.span_id, args.phase, args.start, args.end)
+        return
+
+    spans = tracing.expand_vpc_spans(tracing.load_spans(args.trace))
+    print_report(tracing.summarize_instances(spans), args.top)
+
+    if args.chrome:
+        with open(args.chrome, "w") as file:
+            json.dump(tracing.to_chrome_trace(spans), file)
+        print(f"Chrome trace written to {args.chrome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import json
+
+trace_file = None
+
+
+def add_tracing_arguments(parser):
+    """
+    Add the --trace command-line argument to a parser.
+
+    :param parser: argparse.ArgumentParser
+        The parser to extend.
+
+    :return: None
+    """
+    parser.add_argument("--trace", metavar="TRACE_FILE",
+                        help="Append the start and end of every phase of every instance to this JSON Lines file.")
+
+
+def enable_tracing(file_location):
+    """
+    Start appending spans to a trace file.
+
+    :param file_location: str
+        The path to the JSON Lines trace file.
+
+    :return: None
+    """
+    global trace_file
+    trace_file = file_location
+
+
+def record_span(span_id, phase, start, end, **attributes):
+    """
+    Append a span to the trace file, if tracing is enabled.
+
+    :param span_id: str
+        The ID of the traced item: an instance ID, or a VPC name for the spans covering
+        all the instances of a VPC.
+
+    :param phase: str
+        The name of the phase (e.g. "create_image", "copy", "apply").
+
+    :param start: float
+        The start time in seconds.
+
+    :param end: float
+        The end time in seconds.
+
+    :param attributes: dict
+        Extra values stored with the span, such as the Instances of a VPC span.
+
+    :return: None
+    """
+    if trace_file is None:
+        return
+    span = {"SpanId": span_id, "Phase": phase, "Start": start, "End": end, **attributes}
+    with open(trace_file, "a") as file:
+        file.write(json.dumps(span) + "\n")
+
+
+def record_spans(span_ids, phase, start, end, **attributes):
+    """
+    Append the same span for several traced items, such as the members of an instance group.
+
+    :param span_ids: list
+        The IDs of the traced items.
+
+    :param phase: str
+        The name of the phase.
+
+    :param start: float
+        The start time in seconds.
+
+    :param end: float
+        The end time in seconds.
+
+    :param attributes: dict
+        Extra values stored with every span.
+
+    :return: None
+    """
+    for span_id in span_ids:
+        record_span(span_id, phase, start, end, **attributes)
+
+
+def load_spans(file_location):
+    """
+    Read the spans of a trace file.
+
+    :param file_location: str
+        The path to the JSON Lines trace file.
+
+    :return: list of dict
+        The spans.
+    """
+    spans = []
+    with open(file_location, "r") as file:
+        for line in file:
+            if line.strip():
+                spans.append(json.loads(line))
+    return spans
+
+
+def expand_vpc_spans(spans):
+    """
+    Give every instance of a VPC its own copy of the spans recorded for the VPC.
+
+    Render spans carry the Instances of their VPC; any other span recorded for the same
+    VPC name, such as the apply spans written by execute_migration.sh, uses that list too.
+
+    :param spans: list of dict
+        The spans of a trace.
+
+    :return: list of dict
+        The spans, keyed by instance ID only.
+    """
+    vpc_instances = {}
+    for span in spans:
+        if "Instances" in span:
+            vpc_instances[span["SpanId"]] = span["Instances"]
+
+    instance_spans = []
+    for span in spans:
+        if span["SpanId"] in vpc_instances:
+            for instance_id in vpc_instances[span["SpanId"]]:
+                instance_spans.append(dict(span, SpanId=instance_id, Vpc=span["SpanId"]))
+        else:
+            instance_spans.append(span)
+    return instance_spans
+
+
+def merged_duration(intervals):
+    """
+    Get the time covered by a set of possibly overlapping intervals.
+
+    :param intervals: list of tuple
+        The (start, end) intervals.
+
+    :return: float
+        The total covered time.
+    """
+    covered = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered
+
+
+def summarize_instances(spans):
+    """
+    Summarize the lifecycle of every traced instance.
+
+    An instance is worked on while at least one of its spans is open, and queued during
+    the gaps between its first start and its last end.
+
+    :param spans: list of dict
+        The spans of a trace, with VPC spans already expanded.
+
+    :return: list of dict
+        For each instance: SpanId, Start, End, WorkedSeconds, QueuedSeconds and the
+        Phases durations, sorted by end time, latest first.
+    """
+    spans_by_instance = {}
+    for span in spans:
+        spans_by_instance.setdefault(span["SpanId"], []).append(span)
+
+    summaries = []
+    for span_id, instance_spans in spans_by_instance.items():
+        start = min(span["Start"] for span in instance_spans)
+        end = max(span["End"] for span in instance_spans)
+        worked = merged_duration([(span["Start"], span["End"]) for span in instance_spans])
+        phases = {}
+        for span in instance_spans:
+            phases[span["Phase"]] = phases.get(span["Phase"], 0.0) + span["End"] - span["Start"]
+        summaries.append({
+            "SpanId": span_id,
+            "Start": start,
+            "End": end,
+            "WorkedSeconds": worked,
+            "QueuedSeconds": end - start - worked,
+            "Phases": phases,
+        })
+    return sorted(summaries, key=lambda summary: summary["End"], reverse=True)
+
+
+def find_critical_instances(summaries, tolerance_seconds=1.0):
+    """
+    Get the instances that finished with the wave and therefore set its duration.
+
+    :param summaries: list of dict
+        The instance summaries, as returned by summarize_instances.
+
+    :param tolerance_seconds: float
+        How close to the end of the wave an instance must finish to be critical.
+
+    :return: list of dict
+        The summaries of the critical instances.
+    """
+    if not summaries:
+        return []
+    wave_end = max(summary["End"] for summary in summaries)
+    return [summary for summary in summaries if wave_end - summary["End"] <= tolerance_seconds]
+
+
+def to_chrome_trace(spans):
+    """
+    Convert spans to the Chrome trace event format, one thread per instance.
+
+    The result can be opened in chrome://tracing or Perfetto.
+
+    :param spans: list of dict
+        The spans of a trace, with VPC spans already expanded.
+
+    :return: dict
+        The Chrome trace.
+    """
+    origin = min((span["Start"] for span in spans), default=0.0)
+    thread_ids = {}
+    events = []
+    for span in spans:
+        if span["SpanId"] not in thread_ids:
+            thread_ids[span["SpanId"]] = len(thread_ids) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": thread_ids[span["SpanId"]],
+                           "args": {"name": span["SpanId"]}})
+        events.append({
+            "name": span["Phase"],
+            "cat": "migration",
+            "ph": "X",
+            "ts": (span["Start"] - origin) * 1e6,
+            "dur": (span["End"] - span["Start"]) * 1e6,
+            "pid": 1,
+            "tid": thread_ids[span["SpanId"]],
+            "args": {key: value for key, value in span.items()
+                     if key not in ("SpanId", "Phase", "Start", "End")},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
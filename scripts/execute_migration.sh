@@ -51,15 +51,16 @@ echo "DYNAMODB_TABLE=$DYNAMODB_TABLE"
 echo "EC2 Instance IDs: $INSTANCE_IDS"
 echo
 
-# Notify user about the Python script execution for getting data
-echo "Running Python script to process EC2 instance IDs..."
-# Pass the list of instance IDs to a Python script for processing
-python3 -E ../ec2-region-migrator/get_data.py $INSTANCE_IDS
-
-# Notify user about the second Python script execution for creating Terraform files
-echo "Running Python script to create Terraform files..."
-# Pass the list of instance IDs to another Python script for creating Terraform files
-python3 -E ../ec2-region-migrator/create_tf_files.py $INSTANCE_IDS
+# Notify user about the Python script execution for migrating the instances
+echo "Running Python script to process EC2 instance IDs and create Terraform files..."
+# Copy the AMIs and create the Terraform files in one process, keeping the formatted snapshot for the audit
+# Set TRACE_FILE to trace every phase of every instance, including terraform apply
+TRACE_ARGS=""
+if [ -n "$TRACE_FILE" ]; then
+    TRACE_FILE="$(realpath "$TRACE_FILE")"
+    TRACE_ARGS="--trace $TRACE_FILE"
+fi
+python3 -E ../ec2-region-migrator/migrate.py --snapshot $TRACE_ARGS $INSTANCE_IDS
 
 # Navigate to the terraform directory
 cd ../terraform
@@ -71,6 +72,7 @@ for vpc_dir in vpc-*; do
 
         # Navigate into the VPC directory
         cd "$vpc_dir"
+        APPLY_START=$(date +%s.%N)
 
         # Run Terraform commands
         echo "Running 'terraform init' in $vpc_dir..."
@@ -85,6 +87,10 @@ for vpc_dir in vpc-*; do
         echo "Running 'terraform apply --auto-approve' in $vpc_dir..."
         terraform apply --auto-approve
 
+        if [ -n "$TRACE_FILE" ]; then
+            python3 -E ../../ec2-region-migrator/trace_report.py record "$TRACE_FILE" "$vpc_dir" apply "$APPLY_START" "$(date +%s.%N)"
+        fi
+
         # Navigate back to the terraform directory
         cd ..
 
@@ -97,4 +103,8 @@ cd ../scripts
 
 echo "Terraform process completed for all VPCs."
 
+if [ -n "$TRACE_FILE" ]; then
+    python3 -E ../ec2-region-migrator/trace_report.py report "$TRACE_FILE"
+fi
+
 echo "Script execution completed."